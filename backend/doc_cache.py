@@ -0,0 +1,148 @@
+"""
+In-memory cache for single, rarely-changing MongoDB documents.
+
+A CachedDocument holds one document (looked up by _id) in memory so hot
+request paths can read it without a database round trip. Freshness comes
+from a MongoDB change stream when the deployment supports one (replica
+sets and sharded clusters); on a standalone server it falls back to
+reloading the document once its polling TTL has elapsed.
+
+Listeners registered with add_listener() run whenever the cached copy is
+replaced, whether by a reload, a change stream event or a write-through.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Raised by standalone servers: "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class CachedDocument:
+    """A single MongoDB document cached in memory with change-stream invalidation."""
+
+    def __init__(self, collection, doc_id: Any, poll_interval: float = 10.0, name: str = None):
+        """
+        Args:
+            collection: Motor collection holding the document.
+            doc_id: The document's _id.
+            poll_interval: Seconds a loaded copy stays fresh when no change
+                stream is available.
+            name: Label used in log messages.
+        """
+        self.collection = collection
+        self.doc_id = doc_id
+        self.poll_interval = poll_interval
+        self.name = name or str(doc_id)
+        self._doc: Optional[dict] = None
+        self._loaded_at: Optional[float] = None
+        self._watching = False
+        self._lock = asyncio.Lock()
+        self._listeners: list = []
+        self.loads = 0
+
+    def add_listener(self, callback: Callable[[Optional[dict]], None]) -> None:
+        """Register a callback run with the new document whenever the cached copy changes."""
+        self._listeners.append(callback)
+
+    def _notify(self) -> None:
+        for callback in self._listeners:
+            try:
+                callback(self._doc)
+            except Exception as e:
+                logger.error(f"[doc-cache] Listener error for {self.name}: {e}")
+
+    def _fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        if self._watching:
+            return True
+        return time.monotonic() - self._loaded_at < self.poll_interval
+
+    async def get(self) -> Optional[dict]:
+        """Return the cached document, reloading it only if it may be stale."""
+        if self._fresh():
+            return self._doc
+        async with self._lock:
+            # Another caller may have reloaded while we waited for the lock
+            if self._fresh():
+                return self._doc
+            return await self._load()
+
+    async def refresh(self) -> Optional[dict]:
+        """Reload the document from the database unconditionally."""
+        async with self._lock:
+            return await self._load()
+
+    async def _load(self) -> Optional[dict]:
+        doc = await self.collection.find_one({"_id": self.doc_id})
+        self.loads += 1
+        self.set(doc)
+        return self._doc
+
+    def peek(self) -> Optional[dict]:
+        """Return the cached copy without a freshness check - for callers that can't await."""
+        return self._doc
+
+    def set(self, doc: Optional[dict]) -> None:
+        """Write-through update after this process changed the document itself."""
+        changed = doc != self._doc
+        self._doc = doc
+        self._loaded_at = time.monotonic()
+        if changed:
+            self._notify()
+
+    def invalidate(self) -> None:
+        """Force the next get() to reload from the database."""
+        self._loaded_at = None
+
+    async def watch(self) -> None:
+        """
+        Keep the cached copy current from a change stream.
+
+        Run as a background task. Returns immediately (leaving TTL polling in
+        place) if the server does not support change streams, and reconnects
+        with a delay if the stream drops.
+        """
+        pipeline = [{"$match": {"documentKey._id": self.doc_id}}]
+        while True:
+            try:
+                async with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+                    self._watching = True
+                    # Reload so nothing changed between the last read and the stream opening is missed
+                    await self.refresh()
+                    logger.info(f"[doc-cache] Watching {self.name} via change stream")
+                    async for change in stream:
+                        if change["operationType"] == "delete":
+                            self.set(None)
+                        elif "fullDocument" in change:
+                            self.set(change["fullDocument"])
+                        else:
+                            await self.refresh()
+            except asyncio.CancelledError:
+                self._watching = False
+                raise
+            except OperationFailure as e:
+                self._watching = False
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info(f"[doc-cache] Change streams unavailable, polling {self.name} every {self.poll_interval}s")
+                    return
+                logger.warning(f"[doc-cache] Change stream for {self.name} failed: {e}")
+            except PyMongoError as e:
+                self._watching = False
+                logger.warning(f"[doc-cache] Change stream for {self.name} interrupted: {e}")
+            self.invalidate()
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> dict:
+        return {
+            "mode": "change_stream" if self._watching else "poll",
+            "poll_interval": self.poll_interval,
+            "loads": self.loads,
+        }
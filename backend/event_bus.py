@@ -0,0 +1,112 @@
+"""
+Server-push status channel.
+
+Browsers used to poll /openclaw/status, so every open tab cost a request,
+a session lookup and a supervisor query every few seconds. EventBroadcaster
+instead keeps the latest value of each topic ("gateway", "start",
+"whatsapp") published by the backend's own background producers and fans
+changes out to any number of Server-Sent Events subscribers.
+
+New subscribers first receive the current value of every topic, then each
+change as it is published. A subscriber that falls behind only ever holds
+the latest value per topic, so a slow client cannot make the queue grow.
+
+A topic may carry a key after a colon (e.g. "start:<user_id>") so values
+for different keys don't replace each other; the SSE event name is the
+part before the colon.
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Subscriber:
+    """Pending updates for one client, coalesced per topic."""
+
+    def __init__(self):
+        self.pending: dict = {}
+        self.wakeup = asyncio.Event()
+
+    def push(self, topic: str, data) -> None:
+        self.pending[topic] = data
+        self.wakeup.set()
+
+    def drain(self) -> dict:
+        pending, self.pending = self.pending, {}
+        self.wakeup.clear()
+        return pending
+
+
+class EventBroadcaster:
+    """Latest-value-per-topic broadcaster for Server-Sent Events."""
+
+    def __init__(self, heartbeat_interval: float = 15.0):
+        """
+        Args:
+            heartbeat_interval: Seconds between SSE comment lines sent to idle
+                clients, which keep proxies from closing the connection.
+        """
+        self.heartbeat_interval = heartbeat_interval
+        self._latest: dict = {}
+        self._subscribers: set = set()
+        self.published = 0
+
+    def publish(self, topic: str, data) -> bool:
+        """
+        Set a topic's value and notify subscribers if it changed.
+
+        Returns:
+            True if the value changed and was broadcast.
+        """
+        if self._latest.get(topic) == data:
+            return False
+        self._latest[topic] = data
+        self.published += 1
+        for subscriber in self._subscribers:
+            subscriber.push(topic, data)
+        return True
+
+    def latest(self, topic: str):
+        return self._latest.get(topic)
+
+    async def stream(self, topic_filter: Optional[Callable] = None) -> AsyncIterator[str]:
+        """
+        Yield SSE-formatted messages for one client until it disconnects.
+
+        Args:
+            topic_filter: Optional callable (topic, data) -> data or None used to
+                tailor or hide an update for this client.
+        """
+        subscriber = _Subscriber()
+        for topic, data in self._latest.items():
+            subscriber.push(topic, data)
+        self._subscribers.add(subscriber)
+        try:
+            # Ask the browser to wait a few seconds before reconnecting
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                for topic, data in subscriber.drain().items():
+                    if topic_filter:
+                        data = topic_filter(topic, data)
+                        if data is None:
+                            continue
+                    event_name = topic.split(":", 1)[0]
+                    yield f"event: {event_name}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "topics": sorted(self._latest),
+            "published": self.published,
+        }
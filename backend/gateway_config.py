@@ -2,19 +2,30 @@
 Gateway configuration utilities for writing dynamic environment variables.
 
 This module handles writing secrets (tokens, API keys) to an environment file
-that gets loaded by the supervised gateway wrapper script.
+that gets loaded by the supervised gateway wrapper script, and writing the
+gateway's JSON config file only when its content actually changes.
 """
 
+import hashlib
+import json
 import os
 import stat
+import tempfile
 from pathlib import Path
+from typing import Optional
 
 # Path to the gateway environment file
 GATEWAY_ENV_FILE = "/root/.clawdbot/gateway.env"
 GATEWAY_ENV_DIR = "/root/.clawdbot"
 
 
-def write_gateway_env(token: str, api_key: str = None, provider: str = "emergent") -> None:
+def write_gateway_env(
+    token: str,
+    api_key: str = None,
+    provider: str = "emergent",
+    env_file: str = GATEWAY_ENV_FILE,
+    home: Optional[str] = None,
+) -> None:
     """
     Write secrets to env file before starting gateway.
 
@@ -25,17 +36,22 @@ def write_gateway_env(token: str, api_key: str = None, provider: str = "emergent
         token: The gateway authentication token
         api_key: Optional API key for the provider
         provider: The provider name ("emergent", "anthropic", or "openai")
+        env_file: File to write. Pooled gateways each have their own.
+        home: Optional HOME for the gateway, so it keeps its config and
+            workspace under a per-user directory instead of /root
     """
     # Ensure directory exists
     if os.environ.get("VERCEL"):
         return
 
-    os.makedirs(GATEWAY_ENV_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(env_file), exist_ok=True)
 
     # Build environment file content
     lines = [
         f'export CLAWDBOT_GATEWAY_TOKEN="{token}"',
     ]
+    if home:
+        lines.append(f'export HOME="{home}"')
 
     # Add provider-specific API keys
     if api_key:
@@ -48,14 +64,14 @@ def write_gateway_env(token: str, api_key: str = None, provider: str = "emergent
     # Write the file
     content = "\n".join(lines) + "\n"
 
-    with open(GATEWAY_ENV_FILE, 'w') as f:
+    with open(env_file, 'w') as f:
         f.write(content)
 
     # Set secure permissions (readable only by owner)
-    os.chmod(GATEWAY_ENV_FILE, stat.S_IRUSR | stat.S_IWUSR)  # 0o600
+    os.chmod(env_file, stat.S_IRUSR | stat.S_IWUSR)  # 0o600
 
 
-def clear_gateway_env() -> None:
+def clear_gateway_env(env_file: str = GATEWAY_ENV_FILE) -> None:
     """
     Clear the gateway environment file.
 
@@ -64,5 +80,58 @@ def clear_gateway_env() -> None:
     if os.environ.get("VERCEL"):
         return
 
-    if os.path.exists(GATEWAY_ENV_FILE):
-        os.remove(GATEWAY_ENV_FILE)
+    if os.path.exists(env_file):
+        os.remove(env_file)
+
+
+def config_digest(document: Optional[dict]) -> Optional[str]:
+    """
+    Canonical hash of a JSON document.
+
+    Key order and whitespace don't affect the digest, so a file that was
+    reformatted but not changed hashes the same.
+    """
+    if document is None:
+        return None
+    canonical = json.dumps(document, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def write_json_if_changed(path: str, document: dict, current_digest: Optional[str]) -> bool:
+    """
+    Atomically write a JSON document unless it matches what is on disk.
+
+    The gateway watches its config file, so even a byte-identical rewrite
+    can make it reload. The new content goes to a temp file in the same
+    directory that is then renamed over the original, so the gateway never
+    reads a half-written file.
+
+    Args:
+        path: File to write.
+        document: Target content.
+        current_digest: config_digest() of the file's current content, or
+            None if it is missing or unreadable.
+
+    Returns:
+        True if the file was written (the content changed), False otherwise.
+    """
+    if config_digest(document) == current_digest:
+        return False
+
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(document, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return True
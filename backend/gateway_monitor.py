@@ -0,0 +1,372 @@
+"""
+Background monitor for the gateway process.
+
+Asking supervisor for the gateway's state costs an RPC round trip (or a
+supervisorctl fork), which is too expensive to pay on every proxied request
+and WebSocket accept. GatewayMonitor keeps an in-memory snapshot of the
+gateway's state instead - running flag, pid, uptime and the result of the
+last HTTP health probe - refreshed on a short interval and straight after
+the gateway is started, stopped or restarted. Readers get the snapshot in
+O(1) without touching supervisor.
+
+When supervisord forwards process state events (see supervisor_events),
+apply_event() updates the snapshot as soon as the gateway crashes or comes
+back, and the monitor records how long each unplanned outage lasted.
+
+Listeners registered with add_listener() are called after every update of
+the snapshot, e.g. to push it to browsers.
+
+On a node that doesn't manage the gateway itself (see leader_lease), the
+monitor probes the gateway on the managing node over HTTP instead of asking
+the local supervisor.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+import http_clients
+from supervisor_client import SupervisorClient
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayMonitor:
+    """Periodically refreshed snapshot of the gateway process state."""
+
+    # Supervisor states in which the gateway went away without being asked to
+    FAILURE_STATES = ("EXITED", "BACKOFF", "FATAL", "UNKNOWN")
+    # States that end a readiness wait early - supervisor has given up on this start
+    START_FAILED_STATES = ("EXITED", "FATAL")
+
+    def __init__(
+        self,
+        health_url: str,
+        interval: float = 5.0,
+        probe_timeout: float = 2.0,
+        remote_health_url: Optional[Callable[[], Optional[str]]] = None,
+        program: Optional[str] = None,
+    ):
+        """
+        Args:
+            health_url: Gateway URL probed while the process is running.
+            interval: Seconds between refreshes when nothing has changed.
+            probe_timeout: Timeout for the health probe request.
+            remote_health_url: Optional callable returning the gateway's URL on
+                another node when the gateway is managed elsewhere, or None
+                when it runs here under the local supervisor.
+            program: Supervisor program running the gateway. Defaults to
+                SupervisorClient.PROGRAM.
+        """
+        self.health_url = health_url
+        self.remote_health_url = remote_health_url
+        self.program = program
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.state: Optional[str] = None
+        self.running = False
+        self.pid: Optional[int] = None
+        self.healthy: Optional[bool] = None
+        self.checked_at: Optional[float] = None
+        # When state was last set, by a refresh, an event or a supervisor action
+        self.state_at: Optional[float] = None
+        self._uptime: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh_lock = asyncio.Lock()
+        self.refreshes = 0
+        # Unplanned outages: set when the gateway exits or fails, cleared when it runs again
+        self.down_since: Optional[float] = None
+        self.recoveries = 0
+        self.last_recovery_seconds: Optional[float] = None
+        self.max_recovery_seconds: Optional[float] = None
+        self._total_recovery_seconds = 0.0
+        self.startups = 0
+        self.last_startup_seconds: Optional[float] = None
+        self.max_startup_seconds: Optional[float] = None
+        self._listeners: list = []
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback run after every snapshot update."""
+        self._listeners.append(callback)
+
+    def _changed(self) -> None:
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Gateway monitor listener error: {e}")
+
+    @property
+    def ready(self) -> bool:
+        """Whether at least one snapshot has been taken."""
+        return self.checked_at is not None
+
+    @property
+    def uptime(self) -> Optional[int]:
+        """Uptime in seconds, extrapolated from the last snapshot."""
+        if not self.running or self._uptime is None:
+            return None
+        return self._uptime + int(time.monotonic() - self.checked_at)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "running": self.running,
+            "pid": self.pid,
+            "uptime": self.uptime,
+            "healthy": self.healthy,
+        }
+
+    async def refresh(self) -> dict:
+        """Query supervisor (and probe the gateway if it is running) and update the snapshot."""
+        async with self._refresh_lock:
+            remote_url = self.remote_health_url() if self.remote_health_url else None
+            if remote_url:
+                # Managed by another node - all we can see is whether it answers
+                healthy = await self._probe(remote_url)
+                info = {"state": "RUNNING" if healthy else "UNREACHABLE", "pid": None, "uptime": None}
+                running = healthy
+            else:
+                info = await SupervisorClient.ainfo(self.program)
+                running = info is not None and info["state"] == "RUNNING"
+
+                healthy = None
+                if running:
+                    healthy = await self._probe()
+
+            if running != self.running and self.ready:
+                logger.info(f"Gateway state changed: {self.state} -> {info['state'] if info else None}")
+            self.state = info["state"] if info else None
+            self.state_at = time.monotonic()
+            self.running = running
+            self.pid = info["pid"] if info else None
+            self._uptime = info["uptime"] if info else None
+            self.healthy = healthy
+            self.checked_at = time.monotonic()
+            self.refreshes += 1
+            self._changed()
+            return self.snapshot()
+
+    async def _probe(self, url: Optional[str] = None) -> bool:
+        try:
+            response = await http_clients.get_client("gateway").get(url or self.health_url, timeout=self.probe_timeout)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def _port_open(self) -> bool:
+        """Cheap TCP connect check, done before paying for an HTTP request."""
+        url = urlsplit(self.health_url)
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(url.hostname, url.port or 80), timeout=self.probe_timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    async def wait_until_ready(
+        self,
+        timeout: float = 60.0,
+        initial_interval: float = 0.05,
+        max_interval: float = 1.0,
+        supervisor_check_interval: float = 1.0,
+        record: bool = True,
+    ) -> dict:
+        """
+        Wait for a freshly started gateway to answer its health probe.
+
+        Probes with a TCP connect first and only sends the HTTP probe once the
+        port accepts connections. The interval starts at initial_interval and
+        doubles up to max_interval. Gives up early if supervisor reports that
+        the process exited or went FATAL. With record=False the wait is not
+        counted in the startup stats (e.g. it followed a reload, not a start).
+
+        Returns:
+            {"ready": bool, "elapsed": seconds, "state": supervisor state,
+             "reason": None, "failed" or "timeout"}
+        """
+        started = time.monotonic()
+        interval = initial_interval
+        next_supervisor_check = started + supervisor_check_interval
+
+        while True:
+            if await self._port_open() and await self._probe():
+                elapsed = round(time.monotonic() - started, 3)
+                if record:
+                    self._record_startup(elapsed)
+                self.request_refresh()
+                return {"ready": True, "elapsed": elapsed, "state": self.state, "reason": None}
+
+            now = time.monotonic()
+            if now >= next_supervisor_check:
+                # Pushed events usually get here first; this covers running without the listener
+                await self.refresh()
+                next_supervisor_check = now + supervisor_check_interval
+            # Ignore a failure state left over from before this wait began
+            if self.state in self.START_FAILED_STATES and self.state_at >= started:
+                return {"ready": False, "elapsed": round(now - started, 3), "state": self.state, "reason": "failed"}
+
+            remaining = timeout - (now - started)
+            if remaining <= 0:
+                return {"ready": False, "elapsed": round(now - started, 3), "state": self.state, "reason": "timeout"}
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+
+    async def log_offsets(self) -> Optional[dict]:
+        """Current end of the gateway's stdout and stderr logs, for wait_for_log(), or None if unavailable."""
+        offsets = {}
+        for stream in ("stdout", "stderr"):
+            tail = await SupervisorClient.atail_log(0, 0, stream, self.program)
+            if tail is None:
+                return None
+            offsets[stream] = tail[1]
+        return offsets
+
+    async def wait_for_log(self, pattern: str, offsets: dict, timeout: float, poll_interval: float = 0.1) -> bool:
+        """
+        Wait for the gateway to log a line matching pattern after offsets
+        (from log_offsets()). Returns False on timeout.
+        """
+        regex = re.compile(pattern)
+        offsets = dict(offsets)
+        # Unfinished last line of each stream, completed by the next read
+        partial = {stream: "" for stream in offsets}
+        deadline = time.monotonic() + timeout
+        while True:
+            for stream, offset in offsets.items():
+                tail = await SupervisorClient.atail_log(offset, 65536, stream, self.program)
+                if tail is None:
+                    continue
+                text, offsets[stream] = tail
+                text = partial[stream] + text
+                if regex.search(text):
+                    return True
+                partial[stream] = text.rpartition("\n")[2]
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+
+    def _record_startup(self, seconds: float) -> None:
+        self.startups += 1
+        self.last_startup_seconds = seconds
+        self.max_startup_seconds = max(self.max_startup_seconds or 0.0, seconds)
+        logger.info(f"Gateway ready after {seconds:.3f}s")
+
+    def request_refresh(self) -> None:
+        """Wake the monitor loop for an immediate refresh. Safe to call from any thread."""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def on_supervisor_action(self, action: str) -> None:
+        """
+        SupervisorClient listener.
+
+        Applies the expected outcome of the action to the snapshot right away,
+        so readers never see a stopped gateway as running (or vice versa), then
+        asks the loop to confirm it with a real refresh.
+        """
+        self.running = action in ("start", "restart")
+        self.state = "RUNNING" if self.running else "STOPPED"
+        self.state_at = time.monotonic()
+        self.healthy = None
+        if self.running:
+            self._uptime = 0
+            self.checked_at = time.monotonic()
+        else:
+            self.pid = None
+        self._changed()
+        self.request_refresh()
+
+    def apply_event(self, event: dict) -> None:
+        """
+        Update the snapshot from a forwarded supervisor PROCESS_STATE_* event.
+
+        Args:
+            event: Decoded event with "event" (e.g. "PROCESS_STATE_EXITED"),
+                "pid" and "sent_at" keys.
+        """
+        state = event["event"].removeprefix("PROCESS_STATE_")
+        # Measure from when supervisor saw the change, not when we got the datagram
+        at = time.monotonic() - max(time.time() - event.get("sent_at", time.time()), 0.0)
+
+        if state in self.FAILURE_STATES and self.down_since is None:
+            self.down_since = at
+            logger.warning(f"Gateway went down unexpectedly ({state})")
+        elif state == "STOPPED":
+            self.down_since = None
+        elif state == "RUNNING" and self.down_since is not None:
+            self._record_recovery(max(at - self.down_since, 0.0))
+            self.down_since = None
+
+        self.state = state
+        self.state_at = time.monotonic()
+        self.running = state == "RUNNING"
+        self.healthy = None
+        if self.running:
+            self.pid = event.get("pid")
+            self._uptime = 0
+            self.checked_at = at
+        elif state in ("STOPPED", "EXITED", "FATAL"):
+            self.pid = None
+        self._changed()
+        self.request_refresh()
+
+    def _record_recovery(self, seconds: float) -> None:
+        self.recoveries += 1
+        self.last_recovery_seconds = round(seconds, 3)
+        self.max_recovery_seconds = max(self.max_recovery_seconds or 0.0, self.last_recovery_seconds)
+        self._total_recovery_seconds += seconds
+        logger.info(f"Gateway recovered after {seconds:.3f}s")
+
+    async def run(self) -> None:
+        """Refresh the snapshot every interval seconds, or sooner when requested."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info(f"Gateway monitor started (interval {self.interval}s)")
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Gateway monitor refresh failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self.snapshot(),
+            "refreshes": self.refreshes,
+            "age_seconds": round(time.monotonic() - self.checked_at, 3) if self.ready else None,
+            "down_for_seconds": round(time.monotonic() - self.down_since, 3) if self.down_since else None,
+            "recoveries": self.recoveries,
+            "last_recovery_seconds": self.last_recovery_seconds,
+            "max_recovery_seconds": self.max_recovery_seconds,
+            "avg_recovery_seconds": (
+                round(self._total_recovery_seconds / self.recoveries, 3) if self.recoveries else None
+            ),
+            "startups": self.startups,
+            "last_startup_seconds": self.last_startup_seconds,
+            "max_startup_seconds": self.max_startup_seconds,
+        }
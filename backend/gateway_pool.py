@@ -0,0 +1,452 @@
+"""
+Pool of per-user gateway processes on a range of ports.
+
+By default the host runs a single gateway (supervisor program
+clawdbot-gateway on port 18789) and the whole instance is locked to the
+first user who starts it. With a pool, every port in a configured range is
+a slot with its own supervisor program (clawdbot-gateway-<port>) and env
+file. A user is assigned a slot when they start their gateway, and the
+gateway runs with HOME set to a per-user directory, so each user keeps
+their own clawdbot.json, credentials and workspace across slots.
+
+Slot assignments live in MongoDB (one document per port), so every worker
+routes a user's traffic to the same port. When all slots are taken, the
+least recently used one that has been idle for at least min_idle_seconds
+is evicted: its gateway is stopped and the slot handed to the new user.
+Gateways idle for longer than idle_seconds are stopped in the background
+even when nobody is waiting for a slot. A slot whose gateway is being
+started or stopped is marked busy (busy_until) and is never handed to
+another user meanwhile. A gateway counts as in use while a
+Control UI or status stream is open to it, and always while it has a linked
+messaging channel (WhatsApp), since those see no web traffic at all.
+
+The supervisor programs are generated once, into a single include file,
+when the pool is set up.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from gateway_config import clear_gateway_env
+from gateway_monitor import GatewayMonitor
+from supervisor_client import SupervisorClient
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_PROGRAM_TEMPLATE = """[program:{program}]
+command=/bin/bash -c '. {env_file} && exec {command}'
+autostart=false
+autorestart=true
+startsecs=2
+stopasgroup=true
+killasgroup=true
+stdout_logfile=/var/log/supervisor/{program}.out.log
+stderr_logfile=/var/log/supervisor/{program}.err.log
+"""
+
+# Files under a user's gateway HOME whose presence means a channel is linked
+LINKED_CHANNEL_FILES = (
+    os.path.join(".clawdbot", "credentials", "whatsapp", "default", "creds.json"),
+)
+
+
+def parse_port_range(spec: str) -> List[int]:
+    """Parse "18800-18809" or "18800,18801,18805" (or a mix) into a list of ports."""
+    ports = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(bound) for bound in part.split("-", 1))
+            ports.extend(range(first, last + 1))
+        else:
+            ports.append(int(part))
+    return sorted(set(ports))
+
+
+class GatewayPool:
+    """Assigns users to gateway slots and evicts idle gateways."""
+
+    def __init__(
+        self,
+        collection,
+        ports: List[int],
+        root: str,
+        command: str,
+        supervisor_conf: str,
+        min_idle_seconds: float = 300.0,
+        idle_seconds: float = 1800.0,
+        touch_interval: float = 60.0,
+        cache_ttl: float = 5.0,
+        start_timeout: float = 420.0,
+        active: Optional[Callable[[], bool]] = None,
+    ):
+        """
+        Args:
+            collection: Motor collection holding one document per slot.
+            ports: Ports available to pooled gateways.
+            root: Directory for per-slot env files and per-user homes.
+            command: Command that runs the gateway in the foreground.
+            supervisor_conf: Supervisor include file the programs are written to.
+            min_idle_seconds: A running gateway is only evicted for another
+                user after being idle this long.
+            idle_seconds: Running gateways idle this long are stopped.
+            touch_interval: Minimum seconds between last_used_at writes for
+                one user, so proxied requests don't each write to Mongo. Open
+                connections are kept marked as in use at this interval.
+            cache_ttl: Seconds a slot lookup is served from memory.
+            start_timeout: How long a start may keep a slot busy, so a worker
+                that dies mid-start doesn't block the slot for good.
+            active: Optional callable telling whether this node runs the pooled
+                gateways (e.g. holds the leader lease). Idle eviction is
+                skipped while it returns False.
+        """
+        self.collection = collection
+        self.ports = ports
+        self.root = root
+        self.command = command
+        self.supervisor_conf = supervisor_conf
+        self.min_idle_seconds = min_idle_seconds
+        self.idle_seconds = idle_seconds
+        self.touch_interval = touch_interval
+        self.cache_ttl = cache_ttl
+        self.start_timeout = start_timeout
+        self.active = active
+        # user_id -> (slot document or None, loaded_at)
+        self._cache: dict = {}
+        self._touched: dict = {}
+        self._monitors: dict = {}
+        # port -> in-flight background monitor refresh
+        self._refreshing: dict = {}
+        self._listeners: list = []
+        self.assignments = 0
+        self.evictions = 0
+        self.idle_stops = 0
+
+    def add_listener(self, callback: Callable[[str, Optional[dict]], None]) -> None:
+        """Register a callback run with (user_id, slot) when a user's slot changes; slot is None once evicted."""
+        self._listeners.append(callback)
+
+    def _changed(self, user_id: str, slot: Optional[dict]) -> None:
+        self._cache[user_id] = (slot, time.monotonic())
+        for callback in self._listeners:
+            try:
+                callback(user_id, slot)
+            except Exception as e:
+                logger.error(f"[pool] Listener error: {e}")
+
+    # ============== Layout ==============
+
+    @staticmethod
+    def program(port: int) -> str:
+        return f"clawdbot-gateway-{port}"
+
+    def env_file(self, port: int) -> str:
+        return os.path.join(self.root, "slots", f"{port}.env")
+
+    def home(self, user_id: str) -> str:
+        """The user's gateway HOME, holding .clawdbot/ and the clawd/ workspace."""
+        return os.path.join(self.root, "users", user_id)
+
+    def has_linked_channels(self, user_id: str) -> bool:
+        """Whether the user's gateway has a linked channel, which keeps it in use without any web traffic."""
+        home = self.home(user_id)
+        return any(os.path.exists(os.path.join(home, path)) for path in LINKED_CHANNEL_FILES)
+
+    def monitor(self, port: int) -> GatewayMonitor:
+        """On-demand monitor for a slot's gateway (refreshed by callers, no background loop)."""
+        if port not in self._monitors:
+            self._monitors[port] = GatewayMonitor(health_url=f"http://127.0.0.1:{port}/", program=self.program(port))
+        return self._monitors[port]
+
+    def refresh_monitor(self, port: int) -> GatewayMonitor:
+        """
+        A slot's monitor, refreshed in the background if its snapshot is older
+        than the monitor interval - so polling a status costs at most one
+        supervisor call and probe per slot and interval, and never waits on them.
+        """
+        monitor = self.monitor(port)
+        stale = not monitor.ready or time.monotonic() - monitor.checked_at >= monitor.interval
+        if stale and port not in self._refreshing:
+            self._refreshing[port] = asyncio.create_task(self._refresh_monitor(port, monitor))
+        return monitor
+
+    async def _refresh_monitor(self, port: int, monitor: GatewayMonitor) -> None:
+        try:
+            await monitor.refresh()
+        except Exception as e:
+            logger.warning(f"[pool] Could not refresh the gateway on port {port}: {e}")
+        finally:
+            self._refreshing.pop(port, None)
+
+    def supervisor_config(self) -> str:
+        return "\n".join(
+            SUPERVISOR_PROGRAM_TEMPLATE.format(program=self.program(port), env_file=self.env_file(port), command=self.command)
+            for port in self.ports
+        )
+
+    # ============== Setup ==============
+
+    async def setup(self) -> None:
+        """
+        Create a document per slot and register the slots' supervisor programs.
+
+        On the node running the pooled gateways, slots recorded as running
+        whose program supervisor reports stopped (e.g. after a restart, as the
+        programs don't autostart) are marked stopped.
+        """
+        os.makedirs(os.path.join(self.root, "slots"), exist_ok=True)
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": port},
+                {"$setOnInsert": {"program": self.program(port), "user_id": None, "running": False, "last_used_at": None}},
+                upsert=True
+            )
+            for port in self.ports
+        ], ordered=False)
+
+        content = self.supervisor_config()
+        try:
+            with open(self.supervisor_conf) as f:
+                unchanged = f.read() == content
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            _write_atomic(self.supervisor_conf, content)
+            logger.info(f"[pool] Wrote {len(self.ports)} gateway programs to {self.supervisor_conf}")
+            await SupervisorClient.areload_config()
+
+        if self.active and not self.active():
+            return
+        running = await self.collection.find({"_id": {"$in": self.ports}, "running": True}).to_list(len(self.ports))
+        for slot in running:
+            info = await SupervisorClient.ainfo(self.program(slot["_id"]))
+            # No info means supervisor couldn't be asked - leave the slot alone
+            if info and info["state"] not in ("RUNNING", "STARTING", "BACKOFF"):
+                logger.info(f"[pool] Gateway of {slot['user_id']} on port {slot['_id']} is {info['state']}, marking it stopped")
+                await self.update(slot["_id"], slot["user_id"], running=False, token=None, started_at=None)
+
+    async def stop_local(self) -> int:
+        """
+        Stop every pooled gateway running under the local supervisor, e.g.
+        once another node runs the pool. Their slots are left to that node,
+        whose setup() marks them stopped. Returns how many were stopped.
+        """
+        stopped = 0
+        for port in self.ports:
+            info = await SupervisorClient.ainfo(self.program(port))
+            if info and info["state"] in ("RUNNING", "STARTING", "BACKOFF"):
+                logger.info(f"[pool] Stopping the local gateway on port {port}")
+                await SupervisorClient.astop(self.program(port))
+                clear_gateway_env(self.env_file(port))
+                stopped += 1
+        return stopped
+
+    # ============== Slots ==============
+
+    async def get(self, user_id: str, fresh: bool = False) -> Optional[dict]:
+        """The user's slot, or None if they don't have one."""
+        cached = self._cache.get(user_id)
+        if cached and not fresh and time.monotonic() - cached[1] < self.cache_ttl:
+            return cached[0]
+        slot = await self.collection.find_one({"user_id": user_id})
+        self._cache[user_id] = (slot, time.monotonic())
+        return slot
+
+    async def acquire(self, user_id: str) -> Optional[dict]:
+        """
+        Return the user's slot, assigning one if needed.
+
+        Prefers a free slot, then a stopped one, then the least recently used
+        running gateway idle for at least min_idle_seconds and without linked
+        channels, which is stopped. The slot is returned busy, for the caller
+        to start its gateway. Returns None if every slot is in use.
+        """
+        now = datetime.now(timezone.utc)
+        busy_until = now + timedelta(seconds=self.start_timeout)
+        slot = await self.collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$set": {"busy_until": busy_until}},
+            return_document=ReturnDocument.AFTER
+        )
+        if slot:
+            self._changed(user_id, slot)
+            return slot
+
+        idle_since = now - timedelta(seconds=self.min_idle_seconds)
+        idle = await self.collection.find(
+            {"_id": {"$in": self.ports}, "running": True, "last_used_at": {"$lt": idle_since}}
+        ).to_list(len(self.ports))
+        evictable = [slot["_id"] for slot in idle if not self.has_linked_channels(slot["user_id"])]
+        try:
+            previous = await self.collection.find_one_and_update(
+                {
+                    "_id": {"$in": self.ports},
+                    # Not while another user's gateway is being started or stopped on it
+                    "busy_until": {"$not": {"$gt": now}},
+                    "$or": [
+                        {"user_id": None},
+                        {"running": False},
+                        {"_id": {"$in": evictable}, "last_used_at": {"$lt": idle_since}}
+                    ]
+                },
+                {"$set": {
+                    "user_id": user_id,
+                    "running": False,
+                    "token": None,
+                    "provider": None,
+                    "started_at": None,
+                    "busy_until": busy_until,
+                    "assigned_at": now,
+                    "last_used_at": now
+                }},
+                sort=[("running", 1), ("last_used_at", 1)],
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # Another worker assigned this user a slot at the same time
+            return await self.get(user_id, fresh=True)
+        if previous is None:
+            logger.warning(f"[pool] No gateway slot available for {user_id}")
+            return None
+
+        port = previous["_id"]
+        self.assignments += 1
+        if previous.get("user_id"):
+            self.evictions += 1
+            logger.info(f"[pool] Evicting {previous['user_id']} from port {port} for {user_id}")
+            await self._stop_slot(port, user_id)
+            self._changed(previous["user_id"], None)
+
+        slot = await self.collection.find_one({"_id": port})
+        self._changed(user_id, slot)
+        logger.info(f"[pool] Assigned port {port} to {user_id}")
+        return slot
+
+    async def update(self, port: int, user_id: str, **fields) -> Optional[dict]:
+        """Update a slot's document and cached copy. Returns None if the slot is no longer the user's."""
+        slot = await self.collection.find_one_and_update(
+            {"_id": port, "user_id": user_id},
+            {"$set": fields},
+            return_document=ReturnDocument.AFTER
+        )
+        if slot:
+            self._changed(user_id, slot)
+        return slot
+
+    async def claim(self, slot: dict) -> Optional[dict]:
+        """Keep a slot busy for another start_timeout seconds. Returns None if it was reassigned."""
+        busy_until = datetime.now(timezone.utc) + timedelta(seconds=self.start_timeout)
+        return await self.update(slot["_id"], slot["user_id"], busy_until=busy_until)
+
+    async def stop(self, slot: dict) -> bool:
+        """
+        Stop a slot's gateway, keeping the slot assigned to its user.
+
+        Does nothing if the slot has been given to someone else since, as the
+        gateway on it is theirs now.
+        """
+        port, user_id = slot["_id"], slot["user_id"]
+        if not await self.claim(slot):
+            logger.info(f"[pool] Port {port} no longer belongs to {user_id}, not stopping its gateway")
+            return False
+        stopped = await self._stop_slot(port, user_id)
+        await self.update(port, user_id, running=False, token=None, started_at=None, busy_until=None)
+        return stopped
+
+    async def _stop_slot(self, port: int, user_id: str) -> bool:
+        """Stop the gateway on a port, provided the slot is (still) assigned to user_id."""
+        if not await self.collection.find_one({"_id": port, "user_id": user_id}, {"_id": 1}):
+            return False
+        stopped = await SupervisorClient.astop(self.program(port))
+        clear_gateway_env(self.env_file(port))
+        return stopped
+
+    async def touch(self, slot: dict, force: bool = False) -> None:
+        """Record use of a slot, at most once per touch_interval per user unless forced."""
+        user_id = slot["user_id"]
+        now = time.monotonic()
+        if not force and now - self._touched.get(user_id, 0.0) < self.touch_interval:
+            return
+        self._touched[user_id] = now
+        await self.collection.update_one(
+            {"_id": slot["_id"], "user_id": user_id},
+            {"$set": {"last_used_at": datetime.now(timezone.utc)}}
+        )
+
+    async def keep_alive(self, user_id: str) -> None:
+        """
+        Keep the user's gateway marked as in use, e.g. while a WebSocket relay
+        is open to it. Run as a task and cancel it once the connection ends.
+        """
+        while True:
+            await asyncio.sleep(self.touch_interval)
+            slot = await self.get(user_id)
+            if slot and slot["running"]:
+                try:
+                    await self.touch(slot, force=True)
+                except Exception as e:
+                    logger.warning(f"[pool] Could not record use of port {slot['_id']}: {e}")
+
+    # ============== Eviction ==============
+
+    async def evict_idle(self) -> int:
+        """Stop running gateways idle for longer than idle_seconds. Returns how many were stopped."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.idle_seconds)
+        idle = await self.collection.find({
+            "_id": {"$in": self.ports},
+            "running": True,
+            "last_used_at": {"$lt": cutoff},
+            "busy_until": {"$not": {"$gt": datetime.now(timezone.utc)}}
+        }).to_list(len(self.ports))
+        idle = [slot for slot in idle if not self.has_linked_channels(slot["user_id"])]
+        for slot in idle:
+            logger.info(f"[pool] Stopping idle gateway of {slot['user_id']} on port {slot['_id']}")
+            await self.stop(slot)
+            self.idle_stops += 1
+        return len(idle)
+
+    async def run(self) -> None:
+        """Stop idle gateways periodically. Run as a background task."""
+        interval = min(self.idle_seconds / 4, 60.0)
+        while True:
+            await asyncio.sleep(interval)
+            if self.active and not self.active():
+                continue
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.warning(f"[pool] Idle eviction failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "slots": len(self.ports),
+            "assignments": self.assignments,
+            "evictions": self.evictions,
+            "idle_stops": self.idle_stops,
+        }
+
+
+def _write_atomic(path: str, content: str) -> None:
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,73 @@
+"""
+Streaming HTML script injection.
+
+The Control UI proxy needs to splice a script into every HTML page it
+serves. Rather than decoding the whole page, rewriting it and re-encoding
+it, the injector works on the raw byte stream: it holds back only the bytes
+before the injection point (which may straddle chunk boundaries), splices
+the script in once, and passes the rest of the stream through untouched.
+"""
+
+from typing import AsyncIterator
+
+
+class HtmlScriptInjector:
+    """Incrementally inject a script before </head>, or else after <body>."""
+
+    HEAD_CLOSE = b"</head>"
+    BODY_OPEN = b"<body>"
+
+    def __init__(self, script: bytes, max_buffer: int = 64 * 1024):
+        """
+        Args:
+            script: Bytes to inject.
+            max_buffer: Maximum bytes held back while looking for an injection
+                point. If neither marker shows up within it, the script is
+                prepended to the document instead.
+        """
+        self.script = script
+        self.max_buffer = max_buffer
+        self.injected = False
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Consume a chunk of the document and return the bytes ready to send."""
+        if self.injected:
+            return chunk
+
+        self._buffer += chunk
+
+        index = self._buffer.find(self.HEAD_CLOSE)
+        if index == -1:
+            index = self._buffer.find(self.BODY_OPEN)
+            if index != -1:
+                index += len(self.BODY_OPEN)
+
+        if index != -1:
+            return self._release(self._buffer[:index] + self.script + self._buffer[index:])
+        if len(self._buffer) > self.max_buffer:
+            return self._release(self.script + self._buffer)
+        return b""
+
+    def finish(self) -> bytes:
+        """Flush anything still held back once the upstream document has ended."""
+        if self.injected:
+            return b""
+        return self._release(self.script + self._buffer)
+
+    def _release(self, data: bytes) -> bytes:
+        self.injected = True
+        self._buffer = bytearray()
+        return bytes(data)
+
+
+async def inject_script(chunks: AsyncIterator[bytes], script: bytes) -> AsyncIterator[bytes]:
+    """Wrap an HTML byte stream, splicing script in at the first injection point."""
+    injector = HtmlScriptInjector(script)
+    async for chunk in chunks:
+        data = injector.feed(chunk)
+        if data:
+            yield data
+    tail = injector.finish()
+    if tail:
+        yield tail
@@ -0,0 +1,100 @@
+"""
+Shared, pooled HTTP clients.
+
+Creating an httpx.AsyncClient per request throws away its connection pool,
+so every call pays client construction and a fresh TCP (and TLS) handshake.
+This module hands out long-lived named clients with keep-alive pooling,
+created on first use and closed when the app shuts down. Each client's
+transport counts requests and new connections so the connection reuse
+rate can be reported in metrics.
+
+The clients are shared by every user, so they never store cookies: a
+Set-Cookie from one user's response must not be sent on another user's
+request.
+"""
+
+import logging
+import os
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_MAX_CONNECTIONS = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+
+_clients: dict = {}
+_transports: dict = {}
+
+
+class MeteredTransport(httpx.AsyncHTTPTransport):
+    """Connection-pooling transport that counts requests and newly opened connections."""
+
+    NEW_CONNECTION_EVENTS = (
+        "connection.connect_tcp.complete",
+        "connection.connect_unix_socket.complete",
+    )
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self.new_connections = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        request.extensions = {**request.extensions, "trace": self._trace}
+        return await super().handle_async_request(request)
+
+    async def _trace(self, event_name: str, info: dict) -> None:
+        if event_name in self.NEW_CONNECTION_EVENTS:
+            self.new_connections += 1
+
+    def stats(self) -> dict:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_rate": round(reused / self.requests, 4) if self.requests else None,
+        }
+
+
+def _no_cookies_jar() -> CookieJar:
+    """A cookie jar that rejects every cookie. Cookies passed per request still go out."""
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """
+    Get the shared client for a named upstream, creating it on first use.
+
+    Args:
+        name: Pool name, e.g. "gateway" or "auth". Each name gets its own pool.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+        )
+        transport = MeteredTransport(limits=limits)
+        client = httpx.AsyncClient(transport=transport, cookies=_no_cookies_jar())
+        _clients[name] = client
+        _transports[name] = transport
+        logger.info(f"Created pooled HTTP client '{name}'")
+    return client
+
+
+async def close_all() -> None:
+    """Close every shared client. Called on app shutdown."""
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+    _transports.clear()
+
+
+def stats() -> dict:
+    """Per-pool request, connection and reuse counters."""
+    return {name: transport.stats() for name, transport in _transports.items()}
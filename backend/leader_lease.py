@@ -0,0 +1,175 @@
+"""
+Leader election over a MongoDB lease document.
+
+When several backend replicas share a database, exactly one node may
+manage the gateway through its local supervisord. Nodes compete for a
+lease document: the holder renews it well within its TTL, and any node may
+take it over once it has expired. Every takeover increments a fencing
+token, so writes made by a node that lost the lease without noticing (a
+long GC pause, a network partition) can be rejected by comparing tokens.
+
+Leadership is per node, not per process: all uvicorn workers on a host
+share its supervisord, so they use the same node id and renew the same
+lease.
+
+The lease document also advertises where the leader can be reached, so
+followers can forward gateway traffic to it.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """A renewable, fenced lease on a single MongoDB document."""
+
+    def __init__(
+        self,
+        collection,
+        lease_id: str,
+        node_id: Optional[str] = None,
+        advertise: Optional[dict] = None,
+        ttl_seconds: float = 15.0,
+    ):
+        """
+        Args:
+            collection: Motor collection holding the lease document.
+            lease_id: The lease document's _id.
+            node_id: This node's identity. Defaults to the hostname.
+            advertise: Extra fields published while this node holds the lease,
+                e.g. the URLs other nodes use to reach it.
+            ttl_seconds: How long a lease lasts without renewal. It is renewed
+                every ttl_seconds / 3.
+        """
+        self.collection = collection
+        self.lease_id = lease_id
+        self.node_id = node_id or socket.gethostname()
+        self.advertise = advertise or {}
+        self.ttl_seconds = ttl_seconds
+        self.renew_interval = ttl_seconds / 3
+        self.fencing_token: Optional[int] = None
+        # The current holder's lease document, as last seen
+        self.current: Optional[dict] = None
+        self._valid_until: Optional[float] = None
+        self._listeners: list = []
+        # Leadership as last reported to listeners - is_leader can lapse between checks
+        self._announced = False
+        self.elections = 0
+        self.renewals = 0
+        self.failures = 0
+
+    def add_listener(self, callback: Callable[[bool], None]) -> None:
+        """
+        Register a callback run with True when this node gains the lease, and
+        with False when a lease check shows it is no longer the holder.
+
+        A database outage alone never reports a loss: is_leader lapses, but
+        nobody else can take the lease over while the database is unreachable.
+        """
+        self._listeners.append(callback)
+
+    @property
+    def is_leader(self) -> bool:
+        """
+        Whether this node holds the lease right now.
+
+        Judged against the local clock with a safety margin, so a node stops
+        acting as leader before its lease can expire in the database.
+        """
+        return self._valid_until is not None and time.monotonic() < self._valid_until
+
+    async def try_acquire(self) -> bool:
+        """Renew the lease if we hold it, else take it over if it has expired."""
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        started = time.monotonic()
+
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": self.lease_id, "holder": self.node_id},
+                {"$set": {"expires_at": expires_at, **self.advertise}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is not None:
+                self.renewals += 1
+            else:
+                try:
+                    doc = await self.collection.find_one_and_update(
+                        {"_id": self.lease_id, "expires_at": {"$lt": now}},
+                        {
+                            "$set": {"holder": self.node_id, "expires_at": expires_at, "acquired_at": now, **self.advertise},
+                            "$inc": {"fencing_token": 1},
+                        },
+                        upsert=True,
+                        return_document=ReturnDocument.AFTER,
+                    )
+                except DuplicateKeyError:
+                    # Someone else holds a live lease (the upsert raced an existing document)
+                    doc = None
+                if doc is not None:
+                    self.elections += 1
+                    logger.info(f"[leader] {self.node_id} acquired lease {self.lease_id} (fencing token {doc['fencing_token']})")
+                else:
+                    doc = await self.collection.find_one({"_id": self.lease_id})
+        except PyMongoError as e:
+            self.failures += 1
+            logger.warning(f"[leader] Lease {self.lease_id} check failed: {e}")
+            # Keep whatever validity we had; is_leader lapses on its own, but
+            # the loss is only announced once another holder is seen
+            return self.is_leader
+
+        self.current = doc
+        if doc is not None and doc.get("holder") == self.node_id:
+            self.fencing_token = doc["fencing_token"]
+            # Measured from before the request, leaving a third of the TTL as margin for clock drift
+            self._valid_until = started + self.ttl_seconds * 2 / 3
+        else:
+            self.fencing_token = None
+            self._valid_until = None
+        self._announce()
+        return self.is_leader
+
+    def _announce(self) -> None:
+        leader = self.is_leader
+        if leader == self._announced:
+            return
+        self._announced = leader
+        if not leader:
+            logger.warning(f"[leader] {self.node_id} lost lease {self.lease_id}")
+        for callback in self._listeners:
+            try:
+                callback(leader)
+            except Exception as e:
+                logger.error(f"[leader] Listener error: {e}")
+
+    async def run(self) -> None:
+        """Keep renewing (or competing for) the lease. Run as a background task."""
+        while True:
+            await self.try_acquire()
+            await asyncio.sleep(self.renew_interval)
+
+    def stats(self) -> dict:
+        return {
+            "node_id": self.node_id,
+            "is_leader": self.is_leader,
+            "holder": self.current.get("holder") if self.current else None,
+            "fencing_token": self.current.get("fencing_token") if self.current else None,
+            "elections": self.elections,
+            "renewals": self.renewals,
+            "failures": self.failures,
+        }
+
+
+def default_node_id() -> str:
+    """This node's id: NODE_ID if set, otherwise the hostname."""
+    return os.environ.get("NODE_ID") or socket.gethostname()
@@ -0,0 +1,336 @@
+"""
+Caches for the Control UI proxy.
+
+RewrittenHtmlCache keeps the final, script-injected bytes of Control UI
+pages. An entry is tied to the upstream validators (ETag / Last-Modified)
+it was built from and to the gateway token baked into the injected script,
+so it can be revalidated upstream with a conditional request and is never
+served for a different token.
+
+AssetCache keeps the gateway's static assets (JS, CSS, fonts, images),
+which are immutable for a given gateway version, in memory under a byte
+budget, together with their compressed variants. Cached assets answer
+conditional and range requests locally. Responses the upstream marks
+no-store or private are never kept. The cache must be flushed whenever
+the gateway process restarts.
+"""
+
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from compression import compress
+
+logger = logging.getLogger(__name__)
+
+
+class HtmlCacheEntry:
+    """A rewritten page and the upstream validators it was built from."""
+
+    __slots__ = ("token", "etag", "last_modified", "body", "headers", "status_code", "derived_etag", "variants")
+
+    def __init__(self, token: str, etag: Optional[str], last_modified: Optional[str],
+                 body: bytes, headers: dict, status_code: int):
+        self.token = token
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.headers = headers
+        self.status_code = status_code
+        self.derived_etag = derive_etag(etag or last_modified or "", token)
+        # Compressed copies of body, keyed by content-coding
+        self.variants: dict = {}
+
+    def variant(self, encoding: str) -> bytes:
+        """Return the body compressed with encoding, compressing it only the first time."""
+        data = self.variants.get(encoding)
+        if data is None:
+            data = self.variants[encoding] = compress(self.body, encoding)
+        return data
+
+    def conditional_headers(self) -> dict:
+        """Headers for revalidating this entry against the upstream."""
+        headers = {}
+        if self.etag:
+            headers["if-none-match"] = self.etag
+        if self.last_modified:
+            headers["if-modified-since"] = self.last_modified
+        return headers
+
+
+def derive_etag(upstream_validator: str, token: str) -> str:
+    """
+    ETag for rewritten output: changes when either the upstream page or the token does.
+
+    Weak, because the same page is served as identity, gzip and brotli bodies.
+    """
+    digest = hashlib.sha256(f"{upstream_validator}\0{token}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+class RewrittenHtmlCache:
+    """Small LRU of rewritten Control UI pages keyed by path."""
+
+    def __init__(self, max_entries: int = 32, max_entry_bytes: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, HtmlCacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, token: str) -> Optional[HtmlCacheEntry]:
+        """Return the entry for a path if it was built with the current token."""
+        entry = self._entries.get(key)
+        if entry is None or entry.token != token:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: str, entry: HtmlCacheEntry) -> None:
+        if not (entry.etag or entry.last_modified):
+            # Without validators the entry could never be revalidated
+            return
+        if len(entry.body) > self.max_entry_bytes:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        if self._entries:
+            logger.info(f"Cleared {len(self._entries)} cached Control UI page(s)")
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Extensions of Control UI files that never change for a given gateway version
+STATIC_ASSET_EXTENSIONS = {
+    ".js", ".mjs", ".css", ".map", ".wasm",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico",
+}
+
+
+def is_static_asset(path: str) -> bool:
+    """Whether a proxied path looks like an immutable Control UI asset."""
+    return os.path.splitext(path)[1].lower() in STATIC_ASSET_EXTENSIONS
+
+
+def is_cacheable_response(headers) -> bool:
+    """Whether the upstream allows a shared cache to keep the response (no no-store or private)."""
+    directives = {
+        directive.split("=", 1)[0].strip().lower()
+        for directive in headers.get("cache-control", "").split(",")
+    }
+    return not directives & {"no-store", "private"}
+
+
+class AssetCacheEntry:
+    """A fully buffered static asset and the headers it was served with."""
+
+    __slots__ = ("body", "headers", "etag", "last_modified", "variants")
+
+    def __init__(self, body: bytes, headers: dict):
+        self.body = body
+        self.headers = headers
+        self.etag = headers.get("etag")
+        self.last_modified = headers.get("last-modified")
+        # Compressed copies of body, keyed by content-coding
+        self.variants: dict = {}
+
+    @property
+    def size(self) -> int:
+        """Length of the identity body."""
+        return len(self.body)
+
+    @property
+    def footprint(self) -> int:
+        """Bytes held for this asset, including compressed variants."""
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+
+class AssetCache:
+    """In-memory LRU of static assets bounded by a total byte budget."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, AssetCacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.flushes = 0
+
+    def get(self, key: str) -> Optional[AssetCacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: str, entry: AssetCacheEntry) -> None:
+        if entry.size > self.max_entry_bytes or not is_cacheable_response(entry.headers):
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous.footprint
+        self._entries[key] = entry
+        self.total_bytes += entry.footprint
+        self._evict()
+
+    def variant(self, key: str, entry: AssetCacheEntry, encoding: str) -> bytes:
+        """
+        Return an asset's body compressed with encoding.
+
+        Each asset is compressed at most once per encoding; the result counts
+        against the byte budget for as long as the asset stays cached.
+        """
+        data = entry.variants.get(encoding)
+        if data is None:
+            data = entry.variants[encoding] = compress(entry.body, encoding)
+            if self._entries.get(key) is entry:
+                self.total_bytes += len(data)
+                self._evict()
+        return data
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.footprint
+
+    def clear(self) -> None:
+        if self._entries:
+            logger.info(f"Flushed {len(self._entries)} cached Control UI asset(s)")
+        self._entries.clear()
+        self.total_bytes = 0
+        self.flushes += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "flushes": self.flushes,
+        }
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match list, as RFC 9110 requires."""
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    weak = etag.removeprefix("W/")
+    return "*" in candidates or any(tag.removeprefix("W/") == weak for tag in candidates)
+
+
+def _not_modified(entry: AssetCacheEntry, request_headers) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against a cached asset."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if not entry.etag:
+            return False
+        return etag_matches(entry.etag, if_none_match)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and entry.last_modified:
+        try:
+            return parsedate_to_datetime(entry.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into an inclusive (start, end).
+
+    Returns None for anything we don't serve as a range (multiple ranges,
+    other units, malformed values), and (-1, -1) if the range is unsatisfiable.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    if size == 0:
+        return (-1, -1)
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return (-1, -1)
+            return (max(size - length, 0), size - 1)
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return (-1, -1)
+    return (start, min(end, size - 1))
+
+
+def serve_cached_asset(entry: AssetCacheEntry, request_headers) -> Tuple[int, dict, bytes]:
+    """
+    Build the response for a cached asset, honouring conditional and range requests.
+
+    Returns:
+        (status_code, headers, body)
+    """
+    headers = dict(entry.headers)
+    headers["accept-ranges"] = "bytes"
+
+    if _not_modified(entry, request_headers):
+        validators = {k: v for k, v in headers.items() if k in ("etag", "last-modified", "cache-control")}
+        return 304, validators, b""
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (not if_range or if_range in (entry.etag, entry.last_modified)):
+        size = entry.size
+        byte_range = _parse_range(range_header, size)
+        if byte_range == (-1, -1):
+            headers["content-range"] = f"bytes */{size}"
+            return 416, headers, b""
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            headers["content-length"] = str(end - start + 1)
+            return 206, headers, entry.body[start:end + 1]
+
+    headers["content-length"] = str(entry.size)
+    return 200, headers, entry.body
+
+
+async def capture_stream(
+    chunks: AsyncIterator[bytes],
+    on_complete: Callable[[bytes], None],
+    limit: int,
+) -> AsyncIterator[bytes]:
+    """
+    Pass a byte stream through unchanged while keeping a copy of it.
+
+    on_complete receives the full body once the stream ends, unless the body
+    grew past limit bytes or the stream was abandoned part-way.
+    """
+    captured = bytearray()
+    overflow = False
+    async for chunk in chunks:
+        if not overflow:
+            captured += chunk
+            if len(captured) > limit:
+                overflow = True
+                captured = bytearray()
+        yield chunk
+    if not overflow:
+        on_complete(bytes(captured))
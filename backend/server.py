@@ -1,29 +1,57 @@
 from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Request, Response
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from starlette.websockets import WebSocketState
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 import os
 import logging
 import json
 import secrets
 import subprocess
 import asyncio
+import time
+import socket
+import hashlib
 import httpx
 import websockets
 from websockets.exceptions import ConnectionClosed
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import uuid
+from functools import lru_cache
 from datetime import datetime, timezone, timedelta
 
 # WhatsApp monitoring
-from whatsapp_monitor import get_whatsapp_status, fix_registered_flag
+from whatsapp_monitor import get_whatsapp_status, fix_registered_flag, watch_file, creds_cache, CREDS_FILE
 # Gateway management (supervisor-based)
-from gateway_config import write_gateway_env, clear_gateway_env
+from gateway_config import write_gateway_env, clear_gateway_env, config_digest, write_json_if_changed
 from supervisor_client import SupervisorClient
+from gateway_monitor import GatewayMonitor
+from supervisor_events import SupervisorEventReceiver
+from event_bus import EventBroadcaster
+from leader_lease import LeaderLease, default_node_id
+from single_flight import SingleFlight, MongoLock
+from gateway_pool import GatewayPool, parse_port_range
+# Auth session caching
+from session_cache import SessionCache
+from doc_cache import CachedDocument
+from session_tokens import SignedSessionTokens
+# Shared pooled HTTP clients
+import http_clients
+from html_injector import inject_script
+from proxy_cache import (
+    RewrittenHtmlCache, HtmlCacheEntry, AssetCache, AssetCacheEntry,
+    derive_etag, etag_matches, capture_stream, is_static_asset, is_cacheable_response, serve_cached_asset
+)
+from compression import (
+    JSONCompressionMiddleware, MIN_COMPRESS_SIZE, add_vary_accept_encoding,
+    compress_stream, is_compressible, negotiate_encoding
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -46,14 +74,14 @@ CONFIG_DIR = os.path.expanduser("~/.clawdbot")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "clawdbot.json")
 WORKSPACE_DIR = os.path.expanduser("~/clawd")
 
-# Global state for gateway (per-user)
-# Note: Process is managed by supervisor, we only track metadata here
-gateway_state = {
-    "token": None,
-    "provider": None,
-    "started_at": None,
-    "owner_user_id": None  # Track which user owns this instance
-}
+# Process state (running, pid, uptime, health) is read from this snapshot,
+# refreshed in the background, so request handlers never wait on supervisor
+gateway_monitor = GatewayMonitor(
+    health_url=f"http://127.0.0.1:{MOLTBOT_PORT}/",
+    interval=float(os.environ.get("GATEWAY_MONITOR_INTERVAL", "5")),
+    remote_health_url=lambda: None if is_gateway_node() else f"{gateway_base_url()}/"
+)
+SupervisorClient.add_listener(gateway_monitor.on_supervisor_action)
 
 # Configure logging
 logging.basicConfig(
@@ -63,6 +91,36 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# ============== Database Indexes ==============
+
+# (collection, keys, options) - created idempotently at startup
+DB_INDEXES = [
+    ("user_sessions", [("session_token", 1)], {"unique": True}),
+    # Mongo's TTL monitor deletes sessions once expires_at has passed
+    ("user_sessions", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("users", [("user_id", 1)], {"unique": True}),
+    ("users", [("email", 1)], {"unique": True}),
+    # Revoked signed session tokens are only kept until they would have expired
+    ("revoked_sessions", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    # A user holds at most one gateway pool slot; free slots have user_id None
+    ("gateway_pool", [("user_id", 1)], {"unique": True, "partialFilterExpression": {"user_id": {"$type": "string"}}}),
+]
+
+
+async def ensure_indexes():
+    """Create the auth collection indexes if missing. Safe to run on every startup."""
+    started = time.monotonic()
+    for collection, keys, options in DB_INDEXES:
+        try:
+            name = await db[collection].create_index(keys, **options)
+            logger.info(f"Index ready: {collection}.{name}")
+        except PyMongoError as e:
+            # e.g. an existing index with different options, or duplicate data blocking a unique index
+            logger.warning(f"Could not create index on {collection} {keys}: {e}")
+    elapsed_ms = (time.monotonic() - started) * 1000
+    logger.info(f"Database index bootstrap finished in {elapsed_ms:.1f}ms")
+
+
 # ============== Pydantic Models ==============
 
 class StatusCheck(BaseModel):
@@ -91,6 +149,8 @@ class OpenClawStartResponse(BaseModel):
 class OpenClawStatusResponse(BaseModel):
     running: bool
     pid: Optional[int] = None
+    uptime: Optional[int] = None
+    healthy: Optional[bool] = None
     provider: Optional[str] = None
     started_at: Optional[str] = None
     controlUrl: Optional[str] = None
@@ -116,11 +176,40 @@ class SessionRequest(BaseModel):
 EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
 SESSION_EXPIRY_DAYS = 7
 
+# Resolved sessions are cached in-process; entries never outlive the session's expires_at
+session_cache = SessionCache(
+    max_entries=int(os.environ.get("SESSION_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.environ.get("SESSION_CACHE_TTL_SECONDS", "300"))
+)
+
+# Session token mode: "opaque" (random token looked up in Mongo) or "signed"
+# (HMAC-signed token verified in CPU, with a revocation list for logout)
+SESSION_TOKEN_MODE = os.environ.get("SESSION_TOKEN_MODE", "opaque")
+SESSION_SIGNING_KEY = os.environ.get("SESSION_SIGNING_KEY")
+REVOCATION_SYNC_SECONDS = float(os.environ.get("REVOCATION_SYNC_SECONDS", "30"))
+
+signed_tokens = None
+if SESSION_TOKEN_MODE == "signed":
+    if SESSION_SIGNING_KEY:
+        signed_tokens = SignedSessionTokens(SESSION_SIGNING_KEY)
+    else:
+        logger.warning("SESSION_TOKEN_MODE=signed but SESSION_SIGNING_KEY is not set - using opaque tokens")
+
+# The owner lock almost never changes once set - hold it in memory
+instance_owner_cache = CachedDocument(
+    db.instance_config,
+    "instance_owner",
+    poll_interval=float(os.environ.get("INSTANCE_OWNER_CACHE_TTL_SECONDS", "10")),
+    name="instance_owner"
+)
+
 
 async def get_instance_owner() -> Optional[dict]:
-    """Get the instance owner from database. Returns None if not locked yet."""
-    doc = await db.instance_config.find_one({"_id": "instance_owner"})
-    return doc
+    """Get the instance owner (from memory when fresh). Returns None if not locked yet."""
+    if gateway_pool:
+        # Every user gets their own gateway - the instance is never locked
+        return None
+    return await instance_owner_cache.get()
 
 
 async def set_instance_owner(user: User) -> None:
@@ -137,25 +226,141 @@ async def set_instance_owner(user: User) -> None:
         },
         upsert=True
     )
+    await instance_owner_cache.refresh()
+
+
+# ============== Gateway State ==============
+
+# The gateway's token, provider, start time and owner live in the
+# moltbot_configs "gateway_config" document, so every worker process sees the
+# same state. Note: Process is managed by supervisor, we only track metadata here
+GATEWAY_STATE_FIELDS = ("token", "provider", "started_at", "owner_user_id", "standby")
+
+# Read on every proxied request, so each worker holds it in memory
+gateway_state_cache = CachedDocument(
+    db.moltbot_configs,
+    "gateway_config",
+    poll_interval=float(os.environ.get("GATEWAY_STATE_CACHE_TTL_SECONDS", "2")),
+    name="gateway_config"
+)
+
+
+def gateway_state_from_doc(doc: Optional[dict]) -> dict:
+    doc = doc or {}
+    return {field: doc.get(field) for field in GATEWAY_STATE_FIELDS}
 
 
-async def check_instance_access(user: User) -> bool:
+async def get_gateway_state() -> dict:
+    """Get the gateway's metadata (from memory when fresh)"""
+    return gateway_state_from_doc(await gateway_state_cache.get())
+
+
+def peek_gateway_state() -> dict:
+    """Last known gateway metadata without a freshness check, for code that can't await"""
+    return gateway_state_from_doc(gateway_state_cache.peek())
+
+
+async def update_gateway_state(**fields) -> dict:
+    """Update the shared gateway config document and this worker's cached copy of it"""
+    query = {"_id": "gateway_config"}
+    if leader_lease:
+        # Fenced write: only the current leader may change gateway state, and a
+        # node that lost the lease can't overwrite what its successor wrote
+        if not leader_lease.is_leader:
+            raise HTTPException(status_code=503, detail="This node no longer manages the gateway, please retry")
+        query["$or"] = [
+            {"fencing_token": {"$exists": False}},
+            {"fencing_token": {"$lte": leader_lease.fencing_token}}
+        ]
+        fields["fencing_token"] = leader_lease.fencing_token
+    try:
+        doc = await db.moltbot_configs.find_one_and_update(
+            query,
+            {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The guard didn't match, so the upsert collided with the existing document
+        raise HTTPException(status_code=409, detail="Gateway state was changed by a newer leader, please retry")
+    gateway_state_cache.set(doc)
+    return gateway_state_from_doc(doc)
+
+
+# ============== Gateway Leader ==============
+
+# With several backend replicas, only the node holding this lease manages the
+# gateway through its local supervisor; the others forward start/stop requests
+# to it and proxy Control UI traffic to its gateway. Disabled on Vercel, where
+# there is no supervisor.
+NODE_URL = os.environ.get("NODE_URL")  # How other replicas reach this node's backend
+GATEWAY_ADVERTISE_HOST = os.environ.get("GATEWAY_ADVERTISE_HOST", socket.gethostname())
+
+leader_lease = None
+if not os.environ.get("VERCEL") and os.environ.get("LEADER_ELECTION") == "1":
+    leader_lease = LeaderLease(
+        db.moltbot_configs,
+        "gateway_leader",
+        node_id=default_node_id(),
+        advertise={"node_url": NODE_URL, "gateway_host": GATEWAY_ADVERTISE_HOST},
+        ttl_seconds=float(os.environ.get("LEADER_LEASE_TTL_SECONDS", "15"))
+    )
+
+
+def is_gateway_node() -> bool:
+    """Whether this node manages the gateway (holds the leader lease)"""
+    return leader_lease is None or leader_lease.is_leader
+
+
+def gateway_base_url(port: int = MOLTBOT_PORT) -> str:
+    """Base URL of a gateway: local on the leader, the leader's advertised host elsewhere"""
+    host = "127.0.0.1"
+    if not is_gateway_node() and leader_lease.current:
+        host = leader_lease.current.get("gateway_host") or host
+    return f"http://{host}:{port}"
+
+
+async def forward_to_leader(request: Request) -> Response:
+    """Replay a gateway management request on the leader node"""
+    node_url = (leader_lease.current or {}).get("node_url") if leader_lease else None
+    if not node_url or request.headers.get("x-forwarded-by-node"):
+        # No leader to forward to, or we are the leader's target and lost the lease in between
+        raise HTTPException(status_code=503, detail="The node managing OpenClaw is not reachable, please retry")
+
+    headers = {
+        key: value for key, value in request.headers.items()
+        if key in ("cookie", "authorization", "content-type")
+    }
+    headers["x-forwarded-by-node"] = leader_lease.node_id
+    try:
+        upstream = await http_clients.get_client("leader").request(
+            request.method,
+            f"{node_url.rstrip('/')}{request.url.path}",
+            headers=headers,
+            content=await request.body(),
+            # Starting the gateway can take up to a minute on the leader
+            timeout=90.0
+        )
+    except httpx.HTTPError as e:
+        logger.error(f"[leader] Forwarding {request.url.path} to {node_url} failed: {e}")
+        raise HTTPException(status_code=502, detail="Could not reach the node managing OpenClaw")
+    return Response(
+        content=upstream.content,
+        status_code=upstream.status_code,
+        media_type=upstream.headers.get("content-type")
+    )
+
+
+def check_instance_access(user: User, owner: Optional[dict]) -> bool:
     """Check if user is allowed to access this instance. Returns True if allowed."""
-    owner = await get_instance_owner()
     if not owner:
         # Instance not locked yet - anyone can access
         return True
     return owner.get("user_id") == user.user_id
 
 
-async def get_current_user(request: Request) -> Optional[User]:
-    """
-    Get current user from session token.
-    Checks cookie first, then Authorization header as fallback.
-    Returns None if not authenticated.
-    """
-    session_token = None
-
+def get_session_token(request: Request) -> Optional[str]:
+    """Extract the session token from the cookie, or the Authorization header as fallback."""
     # Check cookie first
     session_token = request.cookies.get("session_token")
 
@@ -165,38 +370,74 @@ async def get_current_user(request: Request) -> Optional[User]:
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header.split(" ")[1]
 
-    if not session_token:
-        return None
+    return session_token
 
-    # Look up session in database
-    session_doc = await db.user_sessions.find_one(
-        {"session_token": session_token},
-        {"_id": 0}
-    )
 
-    if not session_doc:
+async def load_session_user(session_token: str):
+    """
+    Resolve a session token and its user in one round trip.
+
+    The expiry check runs server-side, so expired sessions never leave the database.
+    Returns (User, expires_at), or None if the session is missing, expired or orphaned.
+    """
+    pipeline = [
+        {"$match": {"session_token": session_token}},
+        {"$limit": 1},
+        # expires_at may be stored as a date or an ISO string
+        {"$match": {"$expr": {"$gt": [{"$toDate": "$expires_at"}, "$$NOW"]}}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "as": "user"
+        }},
+        {"$unwind": "$user"},
+        {"$project": {"_id": 0, "expires_at": 1, "user": 1}}
+    ]
+
+    docs = await db.user_sessions.aggregate(pipeline).to_list(1)
+    if not docs:
         return None
+    doc = docs[0]
 
-    # Check expiry
-    expires_at = session_doc.get("expires_at")
+    expires_at = doc["expires_at"]
     if isinstance(expires_at, str):
         expires_at = datetime.fromisoformat(expires_at)
     if expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
 
-    if expires_at < datetime.now(timezone.utc):
-        return None
+    return User(**doc["user"]), expires_at
 
-    # Get user
-    user_doc = await db.users.find_one(
-        {"user_id": session_doc["user_id"]},
-        {"_id": 0}
-    )
 
-    if not user_doc:
+async def get_current_user(request: Request) -> Optional[User]:
+    """
+    Get current user from session token.
+    Checks cookie first, then Authorization header as fallback.
+    Resolved sessions are served from the in-process session cache.
+    Returns None if not authenticated.
+    """
+    session_token = get_session_token(request)
+    if not session_token:
         return None
 
-    return User(**user_doc)
+    # Signed tokens are verified without touching the database
+    if signed_tokens and signed_tokens.looks_signed(session_token):
+        claims = signed_tokens.verify(session_token)
+        if not claims:
+            return None
+        return User(
+            user_id=claims["sub"],
+            email=claims["email"],
+            name=claims["name"],
+            picture=claims.get("picture")
+        )
+
+    # Pick up logouts made on other workers
+    await cache_invalidation.get()
+    return await session_cache.get_or_load(
+        session_token,
+        lambda: load_session_user(session_token)
+    )
 
 
 async def require_auth(request: Request) -> User:
@@ -204,10 +445,10 @@ async def require_auth(request: Request) -> User:
     user = await get_current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    
+
     # Check if user is allowed to access this instance
-    if not await check_instance_access(user):
-        owner = await get_instance_owner()
+    owner = await get_instance_owner()
+    if not check_instance_access(user, owner):
         raise HTTPException(
             status_code=403, 
             detail=f"This instance is locked to {owner.get('email', 'another user')}. Access denied."
@@ -215,6 +456,22 @@ async def require_auth(request: Request) -> User:
     return user
 
 
+async def revocation_sync_loop():
+    """Periodically merge signed-token revocations made by other workers."""
+    while True:
+        try:
+            docs = await db.revoked_sessions.find(
+                {"expires_at": {"$gt": datetime.now(timezone.utc)}}
+            ).to_list(10000)
+            signed_tokens.load_revocations(
+                (doc["_id"], doc["expires_at"].replace(tzinfo=timezone.utc).timestamp())
+                for doc in docs
+            )
+        except Exception as e:
+            logger.warning(f"Could not sync revoked sessions: {e}")
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+
+
 # ============== Auth Endpoints ==============
 
 @api_router.get("/auth/instance")
@@ -238,12 +495,11 @@ async def create_session(request: SessionRequest, response: Response):
     """
     try:
         # Call Emergent Auth to get user data
-        async with httpx.AsyncClient() as client:
-            auth_response = await client.get(
-                EMERGENT_AUTH_URL,
-                headers={"X-Session-ID": request.session_id},
-                timeout=10.0
-            )
+        auth_response = await http_clients.get_client("auth").get(
+            EMERGENT_AUTH_URL,
+            headers={"X-Session-ID": request.session_id},
+            timeout=10.0
+        )
 
         if auth_response.status_code != 200:
             logger.error(f"Emergent Auth error: {auth_response.status_code} - {auth_response.text}")
@@ -288,15 +544,19 @@ async def create_session(request: SessionRequest, response: Response):
             })
 
         # Create session
-        session_token = secrets.token_hex(32)
         expires_at = datetime.now(timezone.utc) + timedelta(days=SESSION_EXPIRY_DAYS)
 
-        await db.user_sessions.insert_one({
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": expires_at,
-            "created_at": datetime.now(timezone.utc)
-        })
+        if signed_tokens:
+            # Stateless: everything needed to authenticate lives in the signed token
+            session_token = signed_tokens.issue(user_id, email, name, picture, expires_at)
+        else:
+            session_token = secrets.token_hex(32)
+            await db.user_sessions.insert_one({
+                "user_id": user_id,
+                "session_token": session_token,
+                "expires_at": expires_at,
+                "created_at": datetime.now(timezone.utc)
+            })
 
         # Set cookie
         response.set_cookie(
@@ -336,10 +596,24 @@ async def get_me(request: Request):
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
     """Logout - delete session and clear cookie"""
-    session_token = request.cookies.get("session_token")
-
-    if session_token:
+    session_token = get_session_token(request)
+
+    if session_token and signed_tokens and signed_tokens.looks_signed(session_token):
+        # Signed tokens can't be deleted - revoke them until they expire
+        revocation = signed_tokens.revocation_entry(session_token)
+        if revocation:
+            jti, exp = revocation
+            signed_tokens.revoke(jti, exp)
+            await db.revoked_sessions.update_one(
+                {"_id": jti},
+                {"$set": {"expires_at": datetime.fromtimestamp(exp, tz=timezone.utc)}},
+                upsert=True
+            )
+    elif session_token:
+        session_cache.evict(session_token)
         await db.user_sessions.delete_one({"session_token": session_token})
+        # Other workers may still hold the session in their caches
+        await broadcast_logout(session_token)
 
     response.delete_cookie(
         key="session_token",
@@ -415,7 +689,8 @@ def generate_token():
     return secrets.token_hex(32)
 
 
-def create_moltbot_config(token: str = None, api_key: str = None, provider: str = "emergent", force_new_token: bool = False):
+def create_moltbot_config(token: str = None, api_key: str = None, provider: str = "emergent", force_new_token: bool = False,
+                          home: str = None, port: int = MOLTBOT_PORT):
     """Update clawdbot.json with gateway config and provider settings
 
     Args:
@@ -423,21 +698,31 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
         api_key: Optional API key for provider.
         provider: The LLM provider - "emergent", "openai", or "anthropic".
         force_new_token: If True, always generates a new token (triggers gateway restart).
+        home: Home directory of a pooled gateway; its config and workspace live
+            under it instead of the shared ~/.clawdbot and ~/clawd.
+        port: Port the gateway listens on.
 
     Returns:
-        The token being used (existing or new).
+        (token, changed): the token being used (existing or new), and whether
+        clawdbot.json was rewritten - i.e. whether a running gateway has to
+        reload its config. Unchanged config is never rewritten.
     """
-    os.makedirs(CONFIG_DIR, exist_ok=True)
-    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+    config_dir = os.path.join(home, ".clawdbot") if home else CONFIG_DIR
+    config_file = os.path.join(config_dir, "clawdbot.json")
+    workspace_dir = os.path.join(home, "clawd") if home else WORKSPACE_DIR
+    os.makedirs(config_dir, exist_ok=True)
+    os.makedirs(workspace_dir, exist_ok=True)
 
     # Load existing config if present
     existing_config = {}
-    if os.path.exists(CONFIG_FILE):
+    if os.path.exists(config_file):
         try:
-            with open(CONFIG_FILE, "r") as f:
+            with open(config_file, "r") as f:
                 existing_config = json.load(f)
         except:
             pass
+    # Fingerprint of what is on disk, taken before existing_config is updated in place
+    current_digest = config_digest(existing_config) if existing_config else None
 
     # Reuse existing token if available (to avoid triggering gateway restart)
     existing_token = None
@@ -455,7 +740,7 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
     # Gateway config to merge
     gateway_config = {
         "mode": "local",
-        "port": MOLTBOT_PORT,
+        "port": port,
         "bind": "lan",
         "auth": {
             "mode": "token",
@@ -482,7 +767,7 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
         existing_config["agents"] = {"defaults": {}}
     if "defaults" not in existing_config["agents"]:
         existing_config["agents"]["defaults"] = {}
-    existing_config["agents"]["defaults"]["workspace"] = WORKSPACE_DIR
+    existing_config["agents"]["defaults"]["workspace"] = workspace_dir
 
     # Configure providers based on selection
     if provider == "emergent":
@@ -640,141 +925,546 @@ def create_moltbot_config(token: str = None, api_key: str = None, provider: str
     # FIX: Check for Vercel environment before writing files
     if os.environ.get('VERCEL'):
         logger.info("Running on Vercel, skipping file write for config.json")
-        return final_token
+        return final_token, False
 
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(existing_config, f, indent=2)
+    if not write_json_if_changed(config_file, existing_config, current_digest):
+        logger.info(f"Moltbot config at {config_file} unchanged for provider: {provider}, not rewriting")
+        return final_token, False
 
-    logger.info(f"Updated Moltbot config at {CONFIG_FILE} for provider: {provider}")
-    return final_token  # Return the token being used
+    logger.info(f"Updated Moltbot config at {config_file} for provider: {provider}")
+    return final_token, True  # Return the token being used
+
+
+async def ensure_clawdbot_command(owner_user_id: str) -> str:
+    """Return the clawdbot command, installing it first if needed"""
+    clawdbot_cmd = get_clawdbot_command()
+    if not clawdbot_cmd:
+        publish_start_stage(owner_user_id, "installing")
+        # The install script can run for minutes - keep it off the event loop
+        if not await asyncio.to_thread(ensure_moltbot_installed):
+            raise HTTPException(status_code=500, detail="OpenClaw (clawdbot) is not installed. Please contact support.")
+        clawdbot_cmd = get_clawdbot_command()
+        if not clawdbot_cmd:
+            raise HTTPException(status_code=500, detail="Failed to find clawdbot after installation")
+    return clawdbot_cmd
 
 
 async def start_gateway_process(api_key: str, provider: str, owner_user_id: str):
     """Start the Moltbot gateway process via supervisor (persistent, survives backend restarts)"""
-    global gateway_state
-
     # FIX: Vercel Serverless Bypass
     if os.environ.get("VERCEL"):
         logger.info("Running on Vercel: Skipping supervisor startup (serverless mode)")
         # Return a dummy token or mock state
         dummy_token = "vercel-serverless-mode-no-gateway"
-        gateway_state["token"] = dummy_token
-        gateway_state["provider"] = provider
-        gateway_state["started_at"] = datetime.now(timezone.utc).isoformat()
-        gateway_state["owner_user_id"] = owner_user_id
+        await update_gateway_state(
+            token=dummy_token,
+            provider=provider,
+            started_at=datetime.now(timezone.utc).isoformat(),
+            owner_user_id=owner_user_id
+        )
         return dummy_token
 
-    # Check if already running via supervisor
-    if SupervisorClient.status():
-        logger.info("Gateway already running via supervisor, recovering state...")
-
-        # Recover token from config
-        token = None
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-            token = config.get("gateway", {}).get("auth", {}).get("token")
-        except:
-            pass
+    started = time.monotonic()
 
-        if not token:
-            token = generate_token()
-            create_moltbot_config(token=token, api_key=api_key, provider=provider, force_new_token=True)
-
-        gateway_state["token"] = token
-        gateway_state["provider"] = provider
-        gateway_state["started_at"] = datetime.now(timezone.utc).isoformat()
-        gateway_state["owner_user_id"] = owner_user_id
-
-        # Update database
-        await db.moltbot_configs.update_one(
-            {"_id": "gateway_config"},
-            {
-                "$set": {
-                    "should_run": True,
-                    "owner_user_id": owner_user_id,
-                    "provider": provider,
-                    "token": token,
-                    "started_at": gateway_state["started_at"],
-                    "updated_at": datetime.now(timezone.utc)
-                }
-            },
-            upsert=True
+    # Check if already running via supervisor
+    if await SupervisorClient.astatus():
+        from_standby = bool((await get_gateway_state())["standby"])
+        log_offsets = None
+        if from_standby:
+            logger.info("Handing the standby gateway to the user, hot-applying their config...")
+            publish_start_stage(owner_user_id, "configuring")
+            # Only log lines written after the config changes count as its reload
+            log_offsets = await gateway_monitor.log_offsets()
+        else:
+            logger.info("Gateway already running via supervisor, recovering state...")
+            publish_start_stage(owner_user_id, "recovering")
+
+        # Recover the token from config and apply the requested provider. The config
+        # is only rewritten - and the gateway only reloads - if something changed
+        token, config_changed = create_moltbot_config(api_key=api_key, provider=provider)
+        if config_changed:
+            logger.info("Gateway config changed, running gateway will reload it")
+        if config_changed or from_standby:
+            # The running gateway keeps its environment, but supervisor's autorestart
+            # re-reads the env file - it must carry the new key, not the old one
+            write_gateway_env(token=token, api_key=api_key, provider=provider)
+
+        # Update shared state
+        await update_gateway_state(
+            should_run=True,
+            standby=False,
+            owner_user_id=owner_user_id,
+            provider=provider,
+            token=token,
+            started_at=datetime.now(timezone.utc).isoformat()
         )
 
+        if from_standby:
+            # The standby answered all along, so readiness alone proves nothing:
+            # wait for the gateway to log that it applied the new config
+            publish_start_stage(owner_user_id, "waiting_ready")
+            reloaded = not config_changed or (
+                log_offsets is not None
+                and await gateway_monitor.wait_for_log(GATEWAY_RELOAD_LOG_PATTERN, log_offsets, timeout=GATEWAY_RELOAD_TIMEOUT_SECONDS)
+            )
+            mode = "standby"
+            if not reloaded:
+                logger.warning("[standby] No sign of the gateway reloading its config, restarting it instead")
+                if not await SupervisorClient.arestart():
+                    raise HTTPException(status_code=500, detail="Failed to restart the standby gateway via supervisor")
+                mode = "cold"
+            # Then make sure it is answering again
+            readiness = await gateway_monitor.wait_until_ready(timeout=60 if mode == "cold" else 30, record=mode == "cold")
+            if not readiness["ready"]:
+                raise HTTPException(status_code=500, detail="Standby gateway did not become ready after applying the config")
+            record_start_latency(mode, time.monotonic() - started)
+
         return token
 
     # Ensure clawdbot is installed
-    clawdbot_cmd = get_clawdbot_command()
-    if not clawdbot_cmd:
-        if not ensure_moltbot_installed():
-            raise HTTPException(status_code=500, detail="OpenClaw (clawdbot) is not installed. Please contact support.")
-        clawdbot_cmd = get_clawdbot_command()
-        if not clawdbot_cmd:
-            raise HTTPException(status_code=500, detail="Failed to find clawdbot after installation")
+    await ensure_clawdbot_command(owner_user_id)
 
     # Create config (reuses existing token to avoid gateway restarts)
-    token = create_moltbot_config(api_key=api_key, provider=provider)
+    publish_start_stage(owner_user_id, "configuring")
+    token, _ = create_moltbot_config(api_key=api_key, provider=provider)
 
     # Write environment file for supervisor wrapper to load
     write_gateway_env(token=token, api_key=api_key, provider=provider)
 
     logger.info(f"Starting Moltbot gateway via supervisor on port {MOLTBOT_PORT}...")
+    publish_start_stage(owner_user_id, "starting")
 
     # Start via supervisor (will auto-restart on crash, survives backend restarts)
-    if not SupervisorClient.start():
+    if not await SupervisorClient.astart():
         raise HTTPException(status_code=500, detail="Failed to start gateway via supervisor")
 
-    # Update in-memory state
-    gateway_state["token"] = token
-    gateway_state["provider"] = provider
-    gateway_state["started_at"] = datetime.now(timezone.utc).isoformat()
-    gateway_state["owner_user_id"] = owner_user_id
+    # Update shared state, so every worker proxies for the new owner and token
+    await update_gateway_state(
+        owner_user_id=owner_user_id,
+        provider=provider,
+        token=token,
+        started_at=datetime.now(timezone.utc).isoformat()
+    )
 
     # Wait for gateway to be ready
-    max_wait = 60
-    start_time = asyncio.get_event_loop().time()
+    publish_start_stage(owner_user_id, "waiting_ready")
+    readiness = await gateway_monitor.wait_until_ready(timeout=60)
+    if readiness["ready"]:
+        logger.info(f"Moltbot gateway is ready! (startup took {readiness['elapsed']}s)")
+        record_start_latency("cold", time.monotonic() - started)
 
-    async with httpx.AsyncClient() as http_client:
-        while asyncio.get_event_loop().time() - start_time < max_wait:
-            try:
-                response = await http_client.get(f"http://127.0.0.1:{MOLTBOT_PORT}/", timeout=2.0)
-                if response.status_code == 200:
-                    logger.info("Moltbot gateway is ready!")
-
-                    # Store config in database for persistence (with should_run flag)
-                    await db.moltbot_configs.update_one(
-                        {"_id": "gateway_config"},
-                        {
-                            "$set": {
-                                "should_run": True,
-                                "owner_user_id": owner_user_id,
-                                "provider": provider,
-                                "token": token,
-                                "started_at": gateway_state["started_at"],
-                                "updated_at": datetime.now(timezone.utc)
-                            }
-                        },
-                        upsert=True
-                    )
-
-                    return token
-            except Exception:
-                pass
-            await asyncio.sleep(1)
+        # Persist the should_run flag so the gateway is brought back after restarts
+        await update_gateway_state(should_run=True)
+
+        return token
 
     # Check supervisor status if not ready
-    if not SupervisorClient.status():
-        raise HTTPException(status_code=500, detail="Gateway failed to start via supervisor")
+    if readiness["reason"] == "failed" or not gateway_monitor.running:
+        raise HTTPException(status_code=500, detail=f"Gateway failed to start via supervisor ({readiness['state']})")
 
     raise HTTPException(status_code=500, detail="Gateway did not become ready in time")
 
 
-def check_gateway_running():
-    """Check if the gateway process is still running via supervisor"""
+# Concurrent /openclaw/start calls share one start: in-process through
+# start_flights, across workers through the start lock document
+# The lock is renewed while a start runs, so the TTL only bounds how long a
+# crashed worker blocks the others; waiters give up after the worst-case start
+# (a first-time install alone may take 300s)
+GATEWAY_START_LOCK_TTL_SECONDS = float(os.environ.get("GATEWAY_START_LOCK_TTL_SECONDS", "180"))
+GATEWAY_START_WAIT_SECONDS = float(os.environ.get("GATEWAY_START_WAIT_SECONDS", "420"))
+start_flights = SingleFlight()
+# In-flight start key -> (owner_user_id, provider, API key digest) it was started with
+start_flight_settings: dict = {}
+gateway_start_lock = None if os.environ.get("VERCEL") else MongoLock(
+    db.moltbot_configs, "gateway_start_lock", ttl_seconds=GATEWAY_START_LOCK_TTL_SECONDS
+)
+
+
+async def start_gateway_once(api_key: str, provider: str, owner_user_id: str) -> dict:
+    """
+    Start the gateway, or join a start already in progress in this or another worker.
+
+    Returns {"token", "owner_user_id"} of the start that ran - which may be
+    another user's, if theirs was in flight first. With the gateway pool,
+    starts are only shared between calls of the same user.
+
+    Raises 409 if the same user already has a start in flight with a
+    different provider or API key, rather than silently applying theirs.
+    """
+    if gateway_pool:
+        key = f"gateway:{owner_user_id}"
+        start_lock = MongoLock(db.moltbot_configs, f"gateway_start_lock:{owner_user_id}", GATEWAY_START_LOCK_TTL_SECONDS)
+        start_process = start_pool_gateway
+    else:
+        key = "gateway"
+        start_lock = gateway_start_lock
+        start_process = start_gateway_process
+
+    settings = (owner_user_id, provider, hashlib.sha256((api_key or "").encode()).hexdigest())
+    if start_flights.in_flight(key):
+        in_flight = start_flight_settings.get(key)
+        if in_flight and in_flight[0] == owner_user_id and in_flight != settings:
+            raise HTTPException(
+                status_code=409,
+                detail="OpenClaw is already starting with a different provider or API key, please retry once it has started"
+            )
+    else:
+        start_flight_settings[key] = settings
+
+    async def start():
+        try:
+            return await start_with_lock()
+        finally:
+            start_flight_settings.pop(key, None)
+
+    async def start_with_lock():
+        while True:
+            if start_lock is None or await start_lock.acquire():
+                renewal = asyncio.create_task(start_lock.keep_renewed()) if start_lock else None
+                try:
+                    token = await start_process(api_key, provider, owner_user_id)
+                finally:
+                    if start_lock:
+                        renewal.cancel()
+                        await start_lock.release()
+                return {"token": token, "owner_user_id": owner_user_id}
+
+            # Another worker is starting the gateway - wait for it and share its outcome
+            logger.info("Gateway start already in progress in another worker, waiting for it...")
+            publish_start_stage(owner_user_id, "waiting_ready")
+            if not await start_lock.wait_released(timeout=GATEWAY_START_WAIT_SECONDS):
+                raise HTTPException(status_code=503, detail="Gateway start is taking too long, please try again")
+            if gateway_pool:
+                slot = await gateway_pool.get(owner_user_id, fresh=True)
+                if not slot or not slot["running"]:
+                    raise HTTPException(status_code=500, detail="Gateway failed to start")
+                return {"token": slot["token"], "owner_user_id": owner_user_id}
+            state = gateway_state_from_doc(await gateway_state_cache.refresh())
+            if state["standby"]:
+                # The lock was held to warm a standby, not for a user - start on it now
+                continue
+            if not (await gateway_monitor.refresh())["running"]:
+                raise HTTPException(status_code=500, detail="Gateway failed to start")
+            return {"token": state["token"], "owner_user_id": state["owner_user_id"]}
+
+    return await start_flights.do(key, start)
+
+
+async def check_gateway_running():
+    """Check if the gateway is running for a user, from the monitor's snapshot - an idle standby doesn't count"""
     if os.environ.get("VERCEL"):
         return True
-    return SupervisorClient.status()
+    if not gateway_monitor.ready:
+        await gateway_monitor.refresh()
+    return gateway_monitor.running and not (await get_gateway_state())["standby"]
+
+
+# ============== Standby Gateway ==============
+
+# With GATEWAY_STANDBY=1, the single gateway is kept booted while nobody uses
+# it, with a throwaway token. /openclaw/start then hot-applies the user's
+# config to it instead of cold-starting Node.js, and a new standby is warmed
+# after the gateway is stopped. Not used with the gateway pool.
+GATEWAY_STANDBY = os.environ.get("GATEWAY_STANDBY") == "1" and not os.environ.get("VERCEL")
+
+# Gateway log lines showing a config change was applied: hot-applied, or
+# applied by an in-process restart that ends with the gateway listening again.
+# Without one within the timeout, the standby is restarted to pick the config up
+GATEWAY_RELOAD_LOG_PATTERN = os.environ.get(
+    "GATEWAY_RELOAD_LOG_PATTERN", r"config hot reload applied|listening on"
+)
+GATEWAY_RELOAD_TIMEOUT_SECONDS = float(os.environ.get("GATEWAY_RELOAD_TIMEOUT_SECONDS", "15"))
+
+# Time from /openclaw/start to a ready gateway, per start mode, to compare them
+start_latency = {
+    mode: {"count": 0, "last_seconds": None, "max_seconds": None, "total_seconds": 0.0}
+    for mode in ("cold", "standby", "pool")
+}
+
+standby_task = None
+
+
+def record_start_latency(mode: str, seconds: float):
+    stats = start_latency[mode]
+    stats["count"] += 1
+    stats["last_seconds"] = round(seconds, 3)
+    stats["max_seconds"] = max(stats["max_seconds"] or 0.0, stats["last_seconds"])
+    stats["total_seconds"] += seconds
+    logger.info(f"Gateway start ({mode}) ready after {seconds:.3f}s")
+
+
+def start_latency_stats() -> dict:
+    return {
+        mode: {
+            "count": stats["count"],
+            "last_seconds": stats["last_seconds"],
+            "max_seconds": stats["max_seconds"],
+            "avg_seconds": round(stats["total_seconds"] / stats["count"], 3) if stats["count"] else None
+        }
+        for mode, stats in start_latency.items()
+    }
+
+
+async def warm_standby():
+    """Boot an idle gateway with a throwaway token, ready to be handed to the next start"""
+    if not GATEWAY_STANDBY or gateway_pool or not is_gateway_node():
+        return
+    if not get_clawdbot_command():
+        # Installing can take minutes; leave it to the first real start
+        logger.info("[standby] clawdbot not installed yet, not warming a standby gateway")
+        return
+    # Holding the start lock keeps a user's start from racing the warm-up
+    if not await gateway_start_lock.acquire():
+        return
+    try:
+        if await SupervisorClient.astatus():
+            return
+
+        # A new token, so nobody who used the previous gateway can reach this one
+        token, _ = create_moltbot_config(force_new_token=True)
+        write_gateway_env(token=token)
+        await update_gateway_state(
+            standby=True,
+            should_run=False,
+            token=token,
+            provider="emergent",
+            started_at=None,
+            owner_user_id=None
+        )
+
+        warm_started = time.monotonic()
+        if not await SupervisorClient.astart():
+            logger.error("[standby] Failed to start the standby gateway via supervisor")
+            await update_gateway_state(standby=False, token=None, provider=None)
+            return
+        readiness = await gateway_monitor.wait_until_ready(timeout=60)
+        if readiness["ready"]:
+            logger.info(f"[standby] Standby gateway ready after {time.monotonic() - warm_started:.3f}s")
+        else:
+            logger.warning(f"[standby] Standby gateway not ready ({readiness['reason']})")
+    finally:
+        await gateway_start_lock.release()
+
+
+def schedule_standby():
+    """Warm a standby gateway in the background"""
+    global standby_task
+    if GATEWAY_STANDBY and (standby_task is None or standby_task.done()):
+        standby_task = asyncio.create_task(warm_standby())
+
+
+# ============== Gateway Pool ==============
+
+# With GATEWAY_POOL_PORTS set (e.g. "18800-18849"), every user gets their own
+# gateway on a port from the range, with its own supervisor program and
+# config directory, instead of the whole instance being locked to one user.
+# Idle gateways are evicted least-recently-used first (see gateway_pool).
+GATEWAY_POOL_PORTS = os.environ.get("GATEWAY_POOL_PORTS")
+
+gateway_pool = None
+if GATEWAY_POOL_PORTS and not os.environ.get("VERCEL"):
+    gateway_pool = GatewayPool(
+        db.gateway_pool,
+        parse_port_range(GATEWAY_POOL_PORTS),
+        root=os.environ.get("GATEWAY_POOL_ROOT", "/root/.clawdbot-pool"),
+        command=os.environ.get("GATEWAY_POOL_COMMAND", f"{CLAWDBOT_WRAPPER} gateway"),
+        supervisor_conf=os.environ.get("GATEWAY_POOL_SUPERVISOR_CONF", "/etc/supervisor/conf.d/clawdbot-gateway-pool.conf"),
+        min_idle_seconds=float(os.environ.get("GATEWAY_POOL_MIN_IDLE_SECONDS", "300")),
+        idle_seconds=float(os.environ.get("GATEWAY_POOL_IDLE_SECONDS", "1800")),
+        start_timeout=GATEWAY_START_WAIT_SECONDS,
+        active=is_gateway_node
+    )
+
+
+async def start_pool_gateway(api_key: str, provider: str, owner_user_id: str) -> str:
+    """Start the user's own gateway from the pool, assigning them a slot first"""
+    slot = await gateway_pool.acquire(owner_user_id)
+    if not slot:
+        raise HTTPException(status_code=503, detail="All OpenClaw gateways are in use, please try again later")
+    try:
+        return await start_pool_slot(slot, api_key, provider, owner_user_id)
+    finally:
+        # Started or not, the slot is no longer busy
+        await gateway_pool.update(slot["_id"], owner_user_id, busy_until=None)
+
+
+def slot_reassigned() -> HTTPException:
+    return HTTPException(status_code=409, detail="Your gateway slot was given to another user, please start again")
+
+
+async def start_pool_slot(slot: dict, api_key: str, provider: str, owner_user_id: str) -> str:
+    """Start the gateway on a busy slot acquired for the user"""
+    started = time.monotonic()
+    port = slot["_id"]
+    program = gateway_pool.program(port)
+    home = gateway_pool.home(owner_user_id)
+
+    await ensure_clawdbot_command(owner_user_id)
+
+    # The user's config persists in their home, so the token survives slot changes
+    publish_start_stage(owner_user_id, "configuring")
+    token, config_changed = create_moltbot_config(api_key=api_key, provider=provider, home=home, port=port)
+
+    # Installing may have taken long enough for the slot to be handed out - and
+    # from here on the program on it runs with this user's config
+    if not await gateway_pool.claim(slot):
+        raise slot_reassigned()
+    if await SupervisorClient.astatus(program):
+        logger.info(f"Pooled gateway on port {port} already running for {owner_user_id}")
+        publish_start_stage(owner_user_id, "recovering")
+        if config_changed:
+            logger.info("Gateway config changed, running gateway will reload it")
+            write_gateway_env(token=token, api_key=api_key, provider=provider, env_file=gateway_pool.env_file(port), home=home)
+        if not await gateway_pool.update(port, owner_user_id, running=True, token=token, provider=provider):
+            raise slot_reassigned()
+        return token
+
+    write_gateway_env(token=token, api_key=api_key, provider=provider, env_file=gateway_pool.env_file(port), home=home)
+
+    logger.info(f"Starting pooled gateway for {owner_user_id} on port {port}...")
+    publish_start_stage(owner_user_id, "starting")
+    if not await SupervisorClient.astart(program):
+        raise HTTPException(status_code=500, detail="Failed to start gateway via supervisor")
+
+    if not await gateway_pool.update(
+        port,
+        owner_user_id,
+        running=True,
+        token=token,
+        provider=provider,
+        started_at=datetime.now(timezone.utc).isoformat()
+    ):
+        raise slot_reassigned()
+
+    publish_start_stage(owner_user_id, "waiting_ready")
+    readiness = await gateway_pool.monitor(port).wait_until_ready(timeout=60)
+    if readiness["ready"]:
+        logger.info(f"Pooled gateway on port {port} is ready! (startup took {readiness['elapsed']}s)")
+        record_start_latency("pool", time.monotonic() - started)
+        return token
+
+    await gateway_pool.stop(slot)
+    if readiness["reason"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Gateway failed to start via supervisor ({readiness['state']})")
+    raise HTTPException(status_code=500, detail="Gateway did not become ready in time")
+
+
+async def resolve_gateway(user: Optional[User]) -> Optional[dict]:
+    """
+    The running gateway that serves this user, or None if it isn't running.
+
+    With the pool that is the user's own gateway; otherwise the single shared
+    gateway, whoever owns it. Returns {"base_url", "token", "provider",
+    "started_at", "owner_user_id"}.
+    """
+    if gateway_pool:
+        slot = await gateway_pool.get(user.user_id) if user else None
+        if not slot or not slot["running"]:
+            return None
+        await gateway_pool.touch(slot)
+        return {
+            "base_url": gateway_base_url(slot["_id"]),
+            "token": slot["token"],
+            "provider": slot["provider"],
+            "started_at": slot["started_at"],
+            "owner_user_id": slot["user_id"]
+        }
+
+    if not await check_gateway_running():
+        return None
+    return {"base_url": gateway_base_url(), **(await get_gateway_state())}
+
+
+# ============== Status Events ==============
+
+# Pushes gateway state, start progress and WhatsApp link status to browsers
+# over /api/openclaw/events, replacing per-tab polling of /openclaw/status
+status_events = EventBroadcaster()
+
+
+def publish_gateway_status():
+    """Publish the gateway's current state on the "gateway" topic"""
+    state = peek_gateway_state()
+    running = bool(os.environ.get("VERCEL")) or (gateway_monitor.running and not state["standby"])
+    status = {"running": running, "state": gateway_monitor.state}
+    if running:
+        status.update(
+            pid=gateway_monitor.pid,
+            healthy=gateway_monitor.healthy,
+            provider=state["provider"],
+            started_at=state["started_at"],
+            controlUrl="/api/openclaw/ui/",
+            owner_user_id=state["owner_user_id"]
+        )
+    status_events.publish("gateway", status)
+
+
+def publish_start_stage(user_id: str, stage: str, detail: Optional[str] = None):
+    """Publish a /openclaw/start progress stage on the user's "start" topic"""
+    status_events.publish(f"start:{user_id}", {"user_id": user_id, "stage": stage, "detail": detail})
+
+
+def publish_pool_status(user_id: str, slot: Optional[dict]):
+    """Publish a pooled gateway's state on its user's "gateway:<user_id>" topic"""
+    running = bool(slot and slot["running"])
+    status = {"running": running, "state": "RUNNING" if running else "STOPPED"}
+    if running:
+        status.update(
+            provider=slot["provider"],
+            started_at=slot["started_at"],
+            controlUrl="/api/openclaw/ui/",
+            owner_user_id=user_id
+        )
+    status_events.publish(f"gateway:{user_id}", status)
+
+
+gateway_monitor.add_listener(publish_gateway_status)
+if gateway_pool:
+    gateway_pool.add_listener(publish_pool_status)
+# Also fires when another worker changes the shared gateway state
+gateway_state_cache.add_listener(lambda doc: publish_gateway_status())
+
+
+async def keep_gateway_alive(stream: AsyncIterator[str], user_id: str) -> AsyncIterator[str]:
+    """Pass a stream through, keeping the user's pooled gateway marked as in use while it is open"""
+    keep_alive = asyncio.create_task(gateway_pool.keep_alive(user_id))
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        keep_alive.cancel()
+
+
+@api_router.get("/openclaw/events")
+async def openclaw_events(request: Request):
+    """Server-Sent Events stream of gateway state, start progress and WhatsApp status (requires auth)"""
+    user = await require_auth(request)
+
+    def for_user(topic: str, data):
+        if topic == "gateway":
+            if gateway_pool:
+                # Each user follows their own pooled gateway's topic instead
+                return None
+            return {**data, "is_owner": data.get("owner_user_id") == user.user_id}
+        if topic.startswith("gateway:"):
+            return {**data, "is_owner": True} if topic == f"gateway:{user.user_id}" else None
+        if topic.startswith("start:"):
+            return data if topic == f"start:{user.user_id}" else None
+        if topic == "whatsapp":
+            # Tracks the single gateway's credentials, not pooled gateways'
+            if gateway_pool:
+                return None
+            return data if peek_gateway_state()["owner_user_id"] == user.user_id else None
+        return data
+
+    stream = status_events.stream(for_user)
+    if gateway_pool:
+        stream = keep_gateway_alive(stream, user.user_id)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # ============== Moltbot API Endpoints (Protected) ==============
@@ -789,6 +1479,10 @@ async def start_moltbot(request: OpenClawStartRequest, req: Request):
     """Start the Moltbot gateway with Emergent provider (requires auth)"""
     user = await require_auth(req)
 
+    # Only the leader node's supervisor may start the gateway
+    if not is_gateway_node():
+        return await forward_to_leader(req)
+
     if request.provider not in ["emergent", "anthropic", "openai"]:
         raise HTTPException(status_code=400, detail="Invalid provider. Use 'emergent', 'anthropic', or 'openai'")
 
@@ -796,19 +1490,30 @@ async def start_moltbot(request: OpenClawStartRequest, req: Request):
     if request.provider in ["anthropic", "openai"] and (not request.apiKey or len(request.apiKey) < 10):
         raise HTTPException(status_code=400, detail="API key required for anthropic/openai providers")
 
-    # Check if Moltbot is already running by another user
-    if check_gateway_running() and gateway_state["owner_user_id"] != user.user_id:
+    # Check if Moltbot is already running by another user (pooled gateways are per user)
+    state = await get_gateway_state()
+    if not gateway_pool and await check_gateway_running() and state["owner_user_id"] != user.user_id:
         raise HTTPException(
             status_code=403,
             detail="OpenClaw is already running by another user. Please wait for them to stop it."
         )
 
     try:
-        token = await start_gateway_process(request.apiKey, request.provider, user.user_id)
+        publish_start_stage(user.user_id, "validating")
+        started = await start_gateway_once(request.apiKey, request.provider, user.user_id)
+        if started["owner_user_id"] != user.user_id:
+            # Lost the race to another user's start
+            raise HTTPException(
+                status_code=403,
+                detail="OpenClaw is already running by another user. Please wait for them to stop it."
+            )
+        token = started["token"]
 
         # Lock the instance to this user on first successful start
-        await set_instance_owner(user)
-        logger.info(f"Instance locked to user: {user.email}")
+        if not gateway_pool:
+            await set_instance_owner(user)
+            logger.info(f"Instance locked to user: {user.email}")
+        publish_start_stage(user.user_id, "ready")
 
         return OpenClawStartResponse(
             ok=True,
@@ -816,10 +1521,12 @@ async def start_moltbot(request: OpenClawStartRequest, req: Request):
             token=token,
             message="OpenClaw started successfully with Emergent provider"
         )
-    except HTTPException:
+    except HTTPException as e:
+        publish_start_stage(user.user_id, "failed", detail=e.detail)
         raise
     except Exception as e:
         logger.error(f"Failed to start Moltbot: {e}")
+        publish_start_stage(user.user_id, "failed", detail=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -827,17 +1534,27 @@ async def start_moltbot(request: OpenClawStartRequest, req: Request):
 async def get_moltbot_status(request: Request):
     """Get the current status of the Moltbot gateway"""
     user = await get_current_user(request)
-    running = check_gateway_running()
 
-    if running:
-        is_owner = user and gateway_state["owner_user_id"] == user.user_id
+    state = await resolve_gateway(user)
+
+    if state:
+        is_owner = user and state["owner_user_id"] == user.user_id
+        monitor = gateway_monitor
+        monitored = not os.environ.get("VERCEL")
+        if gateway_pool:
+            slot = await gateway_pool.get(user.user_id)
+            # Last snapshot; only the node running the pooled gateways can refresh it
+            monitored = is_gateway_node()
+            monitor = gateway_pool.refresh_monitor(slot["_id"]) if monitored else gateway_pool.monitor(slot["_id"])
         return OpenClawStatusResponse(
             running=True,
-            pid=SupervisorClient.get_pid(),
-            provider=gateway_state["provider"],
-            started_at=gateway_state["started_at"],
+            pid=monitor.pid if monitored else None,
+            uptime=monitor.uptime if monitored else None,
+            healthy=monitor.healthy if monitored else None,
+            provider=state["provider"],
+            started_at=state["started_at"],
             controlUrl="/api/openclaw/ui/",
-            owner_user_id=gateway_state["owner_user_id"],
+            owner_user_id=state["owner_user_id"],
             is_owner=is_owner
         )
     else:
@@ -855,38 +1572,51 @@ async def stop_moltbot(request: Request):
     """Stop the Moltbot gateway (only owner can stop)"""
     user = await require_auth(request)
 
-    global gateway_state
-
-    if not check_gateway_running():
+    # Only the leader node's supervisor may stop the gateway
+    if not is_gateway_node():
+        return await forward_to_leader(request)
+
+    if gateway_pool:
+        # The user's own gateway; the slot stays theirs until it is evicted
+        slot = await gateway_pool.get(user.user_id, fresh=True)
+        if not slot or not slot["running"]:
+            return {"ok": True, "message": "OpenClaw is not running"}
+        if not await gateway_pool.stop(slot):
+            logger.error(f"Failed to stop pooled gateway on port {slot['_id']}")
+        flush_proxy_caches()
+        return {"ok": True, "message": "OpenClaw stopped"}
+
+    if not await check_gateway_running():
         # Clear should_run flag even if not running
-        await db.moltbot_configs.update_one(
-            {"_id": "gateway_config"},
-            {"$set": {"should_run": False, "updated_at": datetime.now(timezone.utc)}}
-        )
+        await update_gateway_state(should_run=False)
         return {"ok": True, "message": "OpenClaw is not running"}
 
     # Check if user is the owner
-    if gateway_state["owner_user_id"] != user.user_id:
+    state = await get_gateway_state()
+    if state["owner_user_id"] != user.user_id:
         raise HTTPException(status_code=403, detail="Only the owner can stop OpenClaw")
 
     # Stop via supervisor
-    if not SupervisorClient.stop():
+    if not await SupervisorClient.astop():
         logger.error("Failed to stop gateway via supervisor")
 
     # Clear the gateway env file
     clear_gateway_env()
 
-    # Clear should_run flag in database
-    await db.moltbot_configs.update_one(
-        {"_id": "gateway_config"},
-        {"$set": {"should_run": False, "updated_at": datetime.now(timezone.utc)}}
+    # Clear should_run flag and the shared state
+    await update_gateway_state(
+        should_run=False,
+        token=None,
+        provider=None,
+        started_at=None,
+        owner_user_id=None
     )
 
-    # Clear in-memory state
-    gateway_state["token"] = None
-    gateway_state["provider"] = None
-    gateway_state["started_at"] = None
-    gateway_state["owner_user_id"] = None
+    # Cached pages embed the old token
+    flush_proxy_caches()
+
+    # Boot the next user's gateway ahead of time
+    schedule_standby()
 
     return {"ok": True, "message": "OpenClaw stopped"}
 
@@ -896,81 +1626,111 @@ async def get_moltbot_token(request: Request):
     """Get the current gateway token for authentication (only owner)"""
     user = await require_auth(request)
 
-    if not check_gateway_running():
+    state = await resolve_gateway(user)
+    if not state:
         raise HTTPException(status_code=404, detail="OpenClaw not running")
 
     # Only owner can get the token
-    if gateway_state["owner_user_id"] != user.user_id:
+    if state["owner_user_id"] != user.user_id:
         raise HTTPException(status_code=403, detail="Only the owner can access the token")
 
-    return {"token": gateway_state.get("token")}
+    return {"token": state["token"]}
 
 
 # ============== Moltbot Proxy (Protected) ==============
 
-@api_router.api_route("/openclaw/ui/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
-async def proxy_moltbot_ui(request: Request, path: str = ""):
-    """Proxy requests to the Moltbot Control UI (only owner can access)"""
-    user = await get_current_user(request)
+# Rewritten Control UI pages, keyed by upstream validator and gateway token
+html_cache = RewrittenHtmlCache(
+    max_entries=int(os.environ.get("HTML_CACHE_ENTRIES", "32"))
+)
 
-    if not check_gateway_running():
-        return HTMLResponse(
-            content="<html><body><h1>OpenClaw not running</h1><p>Please start OpenClaw first.</p><a href='/'>Go to setup</a></body></html>",
-            status_code=503
-        )
+# Static Control UI assets, immutable per gateway version - flushed whenever
+# the gateway is (re)started or stopped through SupervisorClient
+asset_cache = AssetCache(
+    max_bytes=int(os.environ.get("ASSET_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+SupervisorClient.add_listener(lambda action: flush_proxy_caches())
 
-    # Check if user is the owner
-    if not user or gateway_state["owner_user_id"] != user.user_id:
-        return HTMLResponse(
-            content="<html><body><h1>Access Denied</h1><p>This OpenClaw instance is owned by another user.</p><a href='/'>Go back</a></body></html>",
-            status_code=403
-        )
 
-    target_url = f"http://127.0.0.1:{MOLTBOT_PORT}/{path}"
+# ============== Cross-worker Cache Invalidation ==============
 
-    # Handle query string
-    if request.query_params:
-        target_url += f"?{request.query_params}"
+# Sessions and Control UI pages/assets are cached per worker. Logouts and
+# cache flushes are broadcast through one shared document that every worker
+# applies; readers of those caches call get() first, so polling keeps up too
+LOGGED_OUT_TOKENS_KEPT = 100
+cache_invalidation = CachedDocument(
+    db.instance_config,
+    "cache_invalidation",
+    poll_interval=float(os.environ.get("CACHE_INVALIDATION_POLL_SECONDS", "2")),
+    name="cache_invalidation"
+)
+applied_proxy_epoch = None
+applied_gateway_events = None
 
-    async with httpx.AsyncClient() as client:
-        try:
-            # Forward the request
-            headers = dict(request.headers)
-            headers.pop("host", None)
-            headers.pop("content-length", None)
-
-            body = await request.body()
-
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                content=body,
-                timeout=30.0
-            )
 
-            # Filter response headers
-            exclude_headers = {"content-encoding", "content-length", "transfer-encoding", "connection"}
-            response_headers = {
-                k: v for k, v in response.headers.items()
-                if k.lower() not in exclude_headers
-            }
+def apply_cache_invalidation(doc: Optional[dict]) -> None:
+    """Drop logged-out sessions and, if another worker flushed them, the proxy caches."""
+    global applied_proxy_epoch, applied_gateway_events
+    doc = doc or {}
+    for session_token in doc.get("logged_out", []):
+        session_cache.evict(session_token)
+    epoch = doc.get("proxy_epoch", 0)
+    if applied_proxy_epoch is not None and epoch != applied_proxy_epoch:
+        asset_cache.clear()
+        html_cache.clear()
+    applied_proxy_epoch = epoch
+    # Another worker received a supervisor event for the gateway
+    gateway_events = doc.get("gateway_events", 0)
+    if applied_gateway_events is not None and gateway_events != applied_gateway_events:
+        gateway_monitor.request_refresh()
+    applied_gateway_events = gateway_events
+
+
+cache_invalidation.add_listener(apply_cache_invalidation)
+
+
+async def broadcast_invalidation(update: dict) -> None:
+    try:
+        doc = await db.instance_config.find_one_and_update(
+            {"_id": "cache_invalidation"},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except PyMongoError as e:
+        logger.warning(f"Could not broadcast cache invalidation: {e}")
+        return
+    cache_invalidation.set(doc)
+
+
+async def broadcast_logout(session_token: str) -> None:
+    """Evict a logged-out session from every worker's session cache."""
+    await broadcast_invalidation(
+        {"$push": {"logged_out": {"$each": [session_token], "$slice": -LOGGED_OUT_TOKENS_KEPT}}}
+    )
 
-            # Get content and rewrite WebSocket URLs if HTML
-            content = response.content
-            content_type = response.headers.get("content-type", "")
 
-            # Get the current gateway token
-            current_token = gateway_state.get("token", "")
+def flush_proxy_caches() -> None:
+    """Drop cached Control UI pages and assets here, and tell the other workers to do the same."""
+    global applied_proxy_epoch
+    asset_cache.clear()
+    html_cache.clear()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    # Our own caches are already empty - don't flush them again when the new epoch arrives
+    applied_proxy_epoch = None
+    loop.create_task(broadcast_invalidation({"$inc": {"proxy_epoch": 1}}))
+
 
-            # If it's HTML, rewrite any WebSocket URLs to use our proxy
-            if "text/html" in content_type:
-                content_str = content.decode('utf-8', errors='ignore')
-                # Inject WebSocket URL override script with token
-                ws_override = f'''
+@lru_cache(maxsize=4)
+def build_ws_override_script(token: str) -> str:
+    """Build the script injected into Control UI HTML to route WebSockets through our proxy."""
+    return f'''
 <script>
 // OpenClaw Proxy Configuration
-window.__MOLTBOT_PROXY_TOKEN__ = "{current_token}";
+window.__MOLTBOT_PROXY_TOKEN__ = "{token}";
 window.__MOLTBOT_PROXY_WS_URL__ = (window.location.protocol === 'https:' ? 'wss:' : 'ws:') + '//' + window.location.host + '/api/openclaw/ws';
 
 // Override WebSocket to use proxy path
@@ -1010,24 +1770,248 @@ window.__MOLTBOT_PROXY_WS_URL__ = (window.location.protocol === 'https:' ? 'wss:
 }})();
 </script>
 '''
-                # Insert before </head> or at start of <body>
-                if '</head>' in content_str:
-                    content_str = content_str.replace('</head>', ws_override + '</head>')
-                elif '<body>' in content_str:
-                    content_str = content_str.replace('<body>', '<body>' + ws_override)
-                else:
-                    content_str = ws_override + content_str
-                content = content_str.encode('utf-8')
 
+
+def response_encoding(request: Request, content_type: str, size: Optional[int] = None) -> Optional[str]:
+    """Negotiated content-coding for a proxied body, or None to send it as-is."""
+    if not is_compressible(content_type):
+        return None
+    if size is not None and size < MIN_COMPRESS_SIZE:
+        return None
+    return negotiate_encoding(request.headers.get("accept-encoding"))
+
+
+def cached_asset_response(request: Request, entry: AssetCacheEntry, key: str) -> Response:
+    """Answer a request for a static asset from the asset cache."""
+    status_code, headers, body = serve_cached_asset(entry, request.headers)
+    if status_code == 304:
+        asset_cache.not_modified += 1
+
+    content_type = entry.headers.get("content-type", "")
+    if is_compressible(content_type):
+        add_vary_accept_encoding(headers)
+        encoding = response_encoding(request, content_type, entry.size) if status_code == 200 else None
+        if encoding:
+            body = asset_cache.variant(key, entry, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            # The compressed bytes differ from the identity ones, so the validator can only be weak
+            if entry.etag and not entry.etag.startswith("W/"):
+                headers["etag"] = f"W/{entry.etag}"
+
+    return Response(
+        content=b"" if request.method == "HEAD" else body,
+        status_code=status_code,
+        headers=headers
+    )
+
+
+@api_router.api_route("/openclaw/ui/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
+async def proxy_moltbot_ui(request: Request, path: str = ""):
+    """Proxy requests to the Moltbot Control UI (only owner can access)"""
+    user = await get_current_user(request)
+
+    state = await resolve_gateway(user)
+    if not state:
+        return HTMLResponse(
+            content="<html><body><h1>OpenClaw not running</h1><p>Please start OpenClaw first.</p><a href='/'>Go to setup</a></body></html>",
+            status_code=503
+        )
+
+    # Check if user is the owner
+    if not user or state["owner_user_id"] != user.user_id:
+        return HTMLResponse(
+            content="<html><body><h1>Access Denied</h1><p>This OpenClaw instance is owned by another user.</p><a href='/'>Go back</a></body></html>",
+            status_code=403
+        )
+
+    target_url = f"{state['base_url']}/{path}"
+
+    # Handle query string
+    if request.query_params:
+        target_url += f"?{request.query_params}"
+
+    # Static assets are answered from memory, including 304s and byte ranges
+    cacheable_asset = request.method in ("GET", "HEAD") and is_static_asset(path)
+    if cacheable_asset:
+        # Pick up flushes made on other workers
+        await cache_invalidation.get()
+        cached_asset = asset_cache.get(target_url)
+        if cached_asset:
+            asset_cache.hits += 1
+            return cached_asset_response(request, cached_asset, target_url)
+
+    client = http_clients.get_client("gateway")
+
+    # Forward the request, streaming any body straight through to the gateway
+    headers = dict(request.headers)
+    headers.pop("host", None)
+    has_body = "content-length" in headers or "transfer-encoding" in headers
+
+    # Compression towards the browser is negotiated here; over loopback it only costs CPU
+    headers["accept-encoding"] = "identity"
+
+    # On an asset cache miss, fetch the full asset so it can be cached;
+    # the client's conditional or range request is then answered locally
+    asset_fill = cacheable_asset and request.method == "GET"
+    if asset_fill:
+        for header in ("if-none-match", "if-modified-since", "range", "if-range"):
+            headers.pop(header, None)
+
+    # A cached rewritten page is revalidated upstream instead of re-fetched
+    current_token = state["token"] or ""
+    cached_page = html_cache.get(target_url, current_token) if request.method == "GET" else None
+    if cached_page:
+        headers.pop("if-none-match", None)
+        headers.pop("if-modified-since", None)
+        headers.update(cached_page.conditional_headers())
+
+    upstream_request = client.build_request(
+        method=request.method,
+        url=target_url,
+        headers=headers,
+        content=request.stream() if has_body else None,
+        timeout=30.0
+    )
+
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except httpx.RequestError as e:
+        logger.error(f"Proxy error: {e}")
+        raise HTTPException(status_code=502, detail="Failed to connect to OpenClaw")
+
+    if cached_page and response.status_code == 304:
+        await response.aclose()
+        html_cache.hits += 1
+        if etag_matches(cached_page.derived_etag, request.headers.get("if-none-match", "")):
             return Response(
-                content=content,
-                status_code=response.status_code,
-                headers=response_headers,
-                media_type=response.headers.get("content-type")
+                status_code=304,
+                headers={"etag": cached_page.derived_etag, "vary": "Accept-Encoding"}
             )
-        except httpx.RequestError as e:
-            logger.error(f"Proxy error: {e}")
-            raise HTTPException(status_code=502, detail="Failed to connect to OpenClaw")
+
+        page_headers = dict(cached_page.headers)
+        add_vary_accept_encoding(page_headers)
+        page_body = cached_page.body
+        encoding = response_encoding(request, "text/html", len(page_body))
+        if encoding:
+            page_body = cached_page.variant(encoding)
+            page_headers["content-encoding"] = encoding
+        return Response(
+            content=page_body,
+            status_code=cached_page.status_code,
+            headers=page_headers
+        )
+
+    # Filter response headers
+    exclude_headers = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+    response_headers = {
+        k: v for k, v in response.headers.items()
+        if k.lower() not in exclude_headers
+    }
+    content_type = response.headers.get("content-type", "")
+
+    # Non-HTML is streamed back chunk by chunk in constant memory
+    if "text/html" not in content_type:
+        body = response.aiter_bytes()
+
+        # The upstream can opt an asset out of caching with no-store or private
+        if asset_fill and response.status_code == 200 and is_cacheable_response(response.headers):
+            asset_cache.misses += 1
+            asset_headers = dict(response_headers)
+            asset_length = response.headers.get("content-length")
+            partial_request = any(
+                header in request.headers
+                for header in ("if-none-match", "if-modified-since", "range")
+            )
+
+            # Only buffer a body whose size is known to fit; a chunked one is
+            # streamed in full and captured up to the entry limit instead
+            if partial_request and asset_length is not None and int(asset_length) <= asset_cache.max_entry_bytes:
+                try:
+                    data = await response.aread()
+                except httpx.RequestError as e:
+                    logger.error(f"Proxy error: {e}")
+                    raise HTTPException(status_code=502, detail="Failed to connect to OpenClaw")
+                finally:
+                    await response.aclose()
+                entry = AssetCacheEntry(data, asset_headers)
+                asset_cache.store(target_url, entry)
+                return cached_asset_response(request, entry, target_url)
+
+            def store_asset(data: bytes):
+                asset_cache.store(target_url, AssetCacheEntry(data, asset_headers))
+
+            body = capture_stream(body, store_asset, asset_cache.max_entry_bytes)
+
+        declared_length = response.headers.get("content-length")
+        if "content-encoding" not in response.headers and declared_length is not None:
+            declared_length = int(declared_length)
+        else:
+            # httpx is decoding the body for us, so the upstream length no longer applies
+            declared_length = None
+
+        encoding = None
+        if response.status_code == 200:
+            encoding = response_encoding(request, content_type, declared_length)
+        if encoding:
+            body = compress_stream(body, encoding)
+            response_headers["content-encoding"] = encoding
+            # As in cached_asset_response: re-encoded bytes only get a weak validator
+            etag = response_headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                response_headers["etag"] = f"W/{etag}"
+        elif declared_length is not None:
+            response_headers["content-length"] = str(declared_length)
+        if is_compressible(content_type):
+            add_vary_accept_encoding(response_headers)
+
+        return StreamingResponse(
+            body,
+            status_code=response.status_code,
+            headers=response_headers,
+            media_type=content_type or None,
+            background=BackgroundTask(response.aclose)
+        )
+
+    # HTML gets the WebSocket override script (with the current gateway token)
+    # spliced in on the fly, without buffering or re-encoding the page
+    ws_override = build_ws_override_script(current_token)
+    body = inject_script(response.aiter_bytes(), ws_override.encode("utf-8"))
+
+    # Browsers must revalidate the rewritten page against our own validator,
+    # which changes with the token, never against the upstream one
+    upstream_etag = response.headers.get("etag")
+    upstream_last_modified = response.headers.get("last-modified")
+    response_headers.pop("etag", None)
+    response_headers.pop("last-modified", None)
+    if upstream_etag or upstream_last_modified:
+        response_headers["etag"] = derive_etag(upstream_etag or upstream_last_modified, current_token)
+
+        if request.method == "GET" and response.status_code == 200:
+            html_cache.misses += 1
+            page_headers = dict(response_headers)
+
+            def store_page(data: bytes):
+                html_cache.store(target_url, HtmlCacheEntry(
+                    current_token, upstream_etag, upstream_last_modified,
+                    data, page_headers, response.status_code
+                ))
+
+            body = capture_stream(body, store_page, html_cache.max_entry_bytes)
+
+    add_vary_accept_encoding(response_headers)
+    encoding = response_encoding(request, content_type) if response.status_code == 200 else None
+    if encoding:
+        body = compress_stream(body, encoding)
+        response_headers["content-encoding"] = encoding
+
+    return StreamingResponse(
+        body,
+        status_code=response.status_code,
+        headers=response_headers,
+        media_type=content_type,
+        background=BackgroundTask(response.aclose)
+    )
 
 
 # Root proxy for Moltbot UI (handles /api/moltbot/ui without trailing path)
@@ -1040,13 +2024,21 @@ async def proxy_moltbot_ui_root(request: Request):
     )
 
 
+# Open client WebSockets relayed to the gateway, so they can be closed as
+# soon as supervisor reports that the gateway went away
+active_ws_relays: set = set()
+
+
 # WebSocket proxy for Moltbot (Protected)
 @api_router.websocket("/openclaw/ws")
 async def websocket_proxy(websocket: WebSocket):
     """WebSocket proxy for Moltbot Control UI"""
     await websocket.accept()
 
-    if not check_gateway_running():
+    # With the gateway pool, the session cookie picks the user's own gateway
+    user = await get_current_user(websocket) if gateway_pool else None
+    state = await resolve_gateway(user)
+    if not state:
         await websocket.close(code=1013, reason="OpenClaw not running")
         return
 
@@ -1054,13 +2046,16 @@ async def websocket_proxy(websocket: WebSocket):
     # The Control UI passes the token in the connect message
 
     # Get the token from state
-    token = gateway_state.get("token")
+    token = state["token"]
 
     # Moltbot expects WebSocket connection with optional auth in query params
-    moltbot_ws_url = f"ws://127.0.0.1:{MOLTBOT_PORT}/"
+    moltbot_ws_url = state["base_url"].replace("http://", "ws://", 1) + "/"
 
     logger.info(f"WebSocket proxy connecting to: {moltbot_ws_url}")
 
+    # A pooled gateway with an open Control UI is in use, however quiet the relay
+    keep_alive = asyncio.create_task(gateway_pool.keep_alive(user.user_id)) if gateway_pool else None
+
     try:
         # Additional headers for connection
         extra_headers = {}
@@ -1074,6 +2069,7 @@ async def websocket_proxy(websocket: WebSocket):
             close_timeout=10,
             additional_headers=extra_headers if extra_headers else None
         ) as moltbot_ws:
+            active_ws_relays.add(websocket)
 
             async def client_to_moltbot():
                 try:
@@ -1121,6 +2117,9 @@ async def websocket_proxy(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket proxy error: {e}")
     finally:
+        if keep_alive:
+            keep_alive.cancel()
+        active_ws_relays.discard(websocket)
         try:
             if websocket.client_state == WebSocketState.CONNECTED:
                 await websocket.close(code=1011, reason="Proxy connection ended")
@@ -1128,6 +2127,92 @@ async def websocket_proxy(websocket: WebSocket):
             pass
 
 
+# ============== Supervisor Events ==============
+
+async def close_ws_relays(code: int, reason: str):
+    """Close every relayed client WebSocket, e.g. because the gateway behind them exited."""
+    relays = list(active_ws_relays)
+    active_ws_relays.clear()
+    for websocket in relays:
+        try:
+            if websocket.client_state == WebSocketState.CONNECTED:
+                await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+    if relays:
+        logger.info(f"Closed {len(relays)} WebSocket relay(s): {reason}")
+
+
+gateway_was_running = False
+
+
+def close_relays_when_gateway_stops():
+    """Monitor listener: close this worker's relays once the gateway stops running.
+
+    Fires however the worker learned of the stop - a supervisor event, a
+    forwarded event or its own poll - so workers without the event socket
+    close their relays too.
+    """
+    global gateway_was_running
+    running = gateway_monitor.running
+    stopped = gateway_was_running and not running
+    gateway_was_running = running
+    if not stopped:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    # 1012: service restart - the Control UI reconnects on its own
+    loop.create_task(close_ws_relays(1012, "Gateway restarting"))
+
+
+gateway_monitor.add_listener(close_relays_when_gateway_stops)
+
+
+def handle_supervisor_event(event: dict):
+    """React to a gateway PROCESS_STATE_* event forwarded by the supervisor event listener"""
+    global applied_gateway_events
+    gateway_monitor.apply_event(event)
+
+    if gateway_monitor.state == "RUNNING":
+        # A new gateway process may serve a different Control UI build
+        flush_proxy_caches()
+    # Only the worker holding the event socket gets the event - have the others refresh now
+    applied_gateway_events = None
+    asyncio.create_task(broadcast_invalidation({"$inc": {"gateway_events": 1}}))
+
+
+supervisor_events = SupervisorEventReceiver(handle_supervisor_event)
+
+
+# ============== Metrics ==============
+
+@api_router.get("/metrics")
+async def get_metrics(request: Request):
+    """Internal performance counters (requires auth)"""
+    await require_auth(request)
+    return {
+        "session_cache": session_cache.stats(),
+        "instance_owner_cache": instance_owner_cache.stats(),
+        "gateway_state_cache": gateway_state_cache.stats(),
+        "cache_invalidation": cache_invalidation.stats(),
+        "signed_tokens": signed_tokens.stats() if signed_tokens else None,
+        "http_pools": http_clients.stats(),
+        "html_cache": html_cache.stats(),
+        "asset_cache": asset_cache.stats(),
+        "gateway_monitor": gateway_monitor.stats(),
+        "leader_lease": leader_lease.stats() if leader_lease else None,
+        "start_flights": start_flights.stats(),
+        "gateway_pool": gateway_pool.stats() if gateway_pool else None,
+        "start_latency": start_latency_stats(),
+        "gateway_start_lock": gateway_start_lock.stats() if gateway_start_lock else None,
+        "supervisor_events": supervisor_events.stats(),
+        "status_events": status_events.stats(),
+        "whatsapp_creds_cache": creds_cache.stats()
+    }
+
+
 # ============== Legacy Status Endpoints ==============
 
 @api_router.post("/status", response_model=StatusCheck)
@@ -1156,6 +2241,12 @@ async def get_status_checks():
 # Include the router in the main app
 app.include_router(api_router)
 
+# Compress larger JSON API responses (the UI proxy negotiates its own encoding)
+app.add_middleware(
+    JSONCompressionMiddleware,
+    minimum_size=int(os.environ.get("API_COMPRESSION_MIN_BYTES", str(MIN_COMPRESS_SIZE)))
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1167,46 +2258,53 @@ app.add_middleware(
 
 # Background task for auto-fixing WhatsApp
 whatsapp_watcher_task = None
+# Background task keeping the instance owner cache current
+instance_owner_watch_task = None
+# Background task syncing signed-token revocations (signed session mode only)
+revocation_sync_task = None
+# Background task refreshing the gateway state snapshot
+gateway_monitor_task = None
+# Background task keeping the shared gateway state cache current
+gateway_state_watch_task = None
+# Background task applying logouts and cache flushes made on other workers
+cache_invalidation_watch_task = None
+# Background task renewing (or competing for) the leader lease
+leader_lease_task = None
+# Gateway recovery or hand-over after a leadership change
+leadership_task = None
+# Background task stopping idle pooled gateways
+gateway_pool_task = None
 
 async def whatsapp_auto_fix_watcher():
-    """Auto-fix Baileys registered=false bug every 5 seconds."""
+    """Auto-fix Baileys registered=false bug whenever the WhatsApp credentials file changes."""
     logger.info("[whatsapp-watcher] Background watcher started")
-    while True:
-        await asyncio.sleep(5)
+    async for _ in watch_file(CREDS_FILE):
+        # The credentials belong to the gateway on the leader node
+        if not is_gateway_node():
+            continue
         try:
             status = get_whatsapp_status()
-            logger.info(f"[whatsapp-watcher] Check: linked={status['linked']}, registered={status['registered']}, phone={status['phone']}")
+            status_events.publish("whatsapp", status)
+            logger.info(f"[whatsapp-watcher] Credentials: linked={status['linked']}, registered={status['registered']}, phone={status['phone']}")
             if status["linked"] and not status["registered"]:
                 logger.info("[whatsapp-watcher] DETECTED registered=false, applying fix...")
                 if fix_registered_flag():
                     logger.info("[whatsapp-watcher] Fix applied, restarting gateway via supervisor...")
-                    result = subprocess.run(["supervisorctl", "restart", "clawdbot-gateway"], capture_output=True, text=True)
-                    logger.info(f"[whatsapp-watcher] Supervisor restart result: {result.stdout} {result.stderr}")
+                    restarted = await SupervisorClient.arestart()
+                    logger.info(f"[whatsapp-watcher] Supervisor restart result: {restarted}")
         except Exception as e:
             logger.warning(f"[whatsapp-watcher] Error: {e}")
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Run on server startup - ensure Moltbot dependencies are installed and auto-start gateway if needed"""
-    global whatsapp_watcher_task, gateway_state
-
-    logger.info("Server starting up...")
-
+async def resume_gateway():
+    """Recover the running gateway's state, or auto-start it if it should be running (leader only)"""
     # Reload supervisor config to pick up any changes
-    SupervisorClient.reload_config()
-
-    # Check and install Moltbot dependencies if needed
-    clawdbot_cmd = get_clawdbot_command()
-    if clawdbot_cmd:
-        logger.info(f"Moltbot dependencies ready: {clawdbot_cmd}")
-    else:
-        logger.info("Moltbot dependencies not found, will install on first use")
+    await SupervisorClient.areload_config()
 
     # Check database for persistent gateway config
     config_doc = None
     try:
-        config_doc = await db.moltbot_configs.find_one({"_id": "gateway_config"})
+        config_doc = await gateway_state_cache.refresh()
     except Exception as e:
         logger.warning(f"Could not read gateway config from database: {e}")
 
@@ -1214,26 +2312,27 @@ async def startup_event():
     logger.info(f"Gateway should_run flag: {should_run}")
 
     # Check if gateway is already running via supervisor
-    if SupervisorClient.status():
-        pid = SupervisorClient.get_pid()
-        logger.info(f"Gateway already running via supervisor (PID: {pid})")
+    await gateway_monitor.refresh()
+    if gateway_monitor.running:
+        logger.info(f"Gateway already running via supervisor (PID: {gateway_monitor.pid})")
 
-        gateway_state["provider"] = config_doc.get("provider", "emergent") if config_doc else "emergent"
+        recovered = {"provider": config_doc.get("provider", "emergent") if config_doc else "emergent"}
 
         # Recover token from config file
         try:
             with open(CONFIG_FILE, 'r') as f:
                 config = json.load(f)
-            gateway_state["token"] = config.get("gateway", {}).get("auth", {}).get("token")
+            recovered["token"] = config.get("gateway", {}).get("auth", {}).get("token")
             logger.info("Recovered gateway token from config file")
         except Exception as e:
             logger.warning(f"Could not recover gateway token: {e}")
 
-        # Recover owner info from database
-        if config_doc:
-            gateway_state["owner_user_id"] = config_doc.get("owner_user_id")
-            gateway_state["started_at"] = config_doc.get("started_at")
-            logger.info(f"Recovered gateway owner from database: {gateway_state['owner_user_id']}")
+        # Owner info is already in the database; only write what differs, since
+        # every worker runs this on startup
+        state = gateway_state_from_doc(config_doc)
+        if any(state[field] != value for field, value in recovered.items()):
+            state = await update_gateway_state(**recovered)
+        logger.info(f"Recovered gateway owner from database: {state['owner_user_id']}")
 
     elif should_run and config_doc:
         # Gateway should be running but isn't - auto-start it!
@@ -1253,35 +2352,136 @@ async def startup_event():
         write_gateway_env(token=token, provider=config_doc.get("provider", "emergent"))
 
         # Start via supervisor
-        if SupervisorClient.start():
+        if await SupervisorClient.astart():
             logger.info("Gateway auto-started successfully via supervisor")
 
             # Wait briefly for it to be ready
-            await asyncio.sleep(3)
+            await gateway_monitor.wait_until_ready(timeout=3)
 
-            gateway_state["token"] = token
-            gateway_state["provider"] = config_doc.get("provider", "emergent")
-            gateway_state["owner_user_id"] = config_doc.get("owner_user_id")
-            gateway_state["started_at"] = config_doc.get("started_at")
+            # Owner and start time are already in the database
+            await update_gateway_state(token=token, provider=config_doc.get("provider", "emergent"))
         else:
             logger.error("Failed to auto-start gateway via supervisor")
 
+    else:
+        schedule_standby()
+
+
+async def hand_over_gateway():
+    """Stop the local gateways after another node took the leader lease over, so its gateways are the only ones"""
+    if leader_lease.is_leader:
+        # Won the lease back in the meantime
+        return
+    if await SupervisorClient.astatus():
+        logger.warning("[leader] Lost the leader lease - stopping the local gateway")
+        await SupervisorClient.astop()
+    gateway_monitor.request_refresh()
+    if gateway_pool:
+        stopped = await gateway_pool.stop_local()
+        if stopped:
+            logger.warning(f"[leader] Lost the leader lease - stopped {stopped} local pooled gateway(s)")
+
+
+async def apply_leadership_change(previous: Optional[asyncio.Task], leader: bool):
+    if previous:
+        # Never resume and hand over the gateway at the same time
+        await asyncio.wait([previous])
+    if leader:
+        await resume_gateway()
+        if gateway_pool:
+            # Slots still marked running on the previous leader's gateways are stopped here
+            try:
+                await gateway_pool.setup()
+            except Exception as e:
+                logger.error(f"[pool] Could not reconcile the gateway pool: {e}")
+    else:
+        await hand_over_gateway()
+
+
+def on_leadership_change(leader: bool):
+    global leadership_task
+    previous = leadership_task
+    if previous and previous.done():
+        previous = None
+    elif previous:
+        # Superseded - e.g. a resume still waiting for the gateway when the lease was lost
+        previous.cancel()
+    leadership_task = asyncio.create_task(apply_leadership_change(previous, leader))
+
+
+if leader_lease:
+    leader_lease.add_listener(on_leadership_change)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Run on server startup - ensure Moltbot dependencies are installed and auto-start gateway if needed"""
+    global whatsapp_watcher_task, instance_owner_watch_task, revocation_sync_task, gateway_monitor_task
+    global gateway_state_watch_task, cache_invalidation_watch_task, leader_lease_task, gateway_pool_task
+
+    logger.info("Server starting up...")
+
+    # Make sure auth lookups are indexed and expired sessions get cleaned up
+    await ensure_indexes()
+
+    # Keep the instance owner lock and the shared gateway state in memory
+    instance_owner_watch_task = asyncio.create_task(instance_owner_cache.watch())
+    gateway_state_watch_task = asyncio.create_task(gateway_state_cache.watch())
+    cache_invalidation_watch_task = asyncio.create_task(cache_invalidation.watch())
+
+    if signed_tokens:
+        logger.info("Session tokens: signed mode (stateless verification)")
+        revocation_sync_task = asyncio.create_task(revocation_sync_loop())
+
+    # Check and install Moltbot dependencies if needed
+    clawdbot_cmd = get_clawdbot_command()
+    if clawdbot_cmd:
+        logger.info(f"Moltbot dependencies ready: {clawdbot_cmd}")
+    else:
+        logger.info("Moltbot dependencies not found, will install on first use")
+
+    # Manage the gateway only on the node holding the leader lease
+    if leader_lease:
+        await leader_lease.try_acquire()
+        leader_lease_task = asyncio.create_task(leader_lease.run())
+        if not leader_lease.is_leader:
+            logger.info(f"[leader] Gateway is managed by {leader_lease.stats()['holder']}, this node forwards to it")
+    else:
+        await resume_gateway()
+
+    # Register the pooled gateways' supervisor programs and stop idle ones
+    if gateway_pool:
+        try:
+            await gateway_pool.setup()
+        except Exception as e:
+            logger.error(f"[pool] Could not set up the gateway pool: {e}")
+        gateway_pool_task = asyncio.create_task(gateway_pool.run())
+
+    # Keep the gateway state snapshot fresh, with crashes and restarts pushed by supervisor
+    gateway_monitor_task = asyncio.create_task(gateway_monitor.run())
+    await supervisor_events.start()
+
     # Start WhatsApp auto-fix background watcher
     whatsapp_watcher_task = asyncio.create_task(whatsapp_auto_fix_watcher())
-    logger.info("[whatsapp-watcher] Background watcher task created (checks every 5s)")
+    logger.info("[whatsapp-watcher] Background watcher task created (runs on credentials file changes)")
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    global whatsapp_watcher_task
-
-    # Stop WhatsApp watcher task
-    if whatsapp_watcher_task:
-        whatsapp_watcher_task.cancel()
-        try:
-            await whatsapp_watcher_task
-        except asyncio.CancelledError:
-            pass
+    global whatsapp_watcher_task, instance_owner_watch_task, revocation_sync_task, gateway_monitor_task
+    global gateway_state_watch_task, cache_invalidation_watch_task, leader_lease_task, leadership_task
+    global gateway_pool_task, standby_task
+
+    # Stop background tasks
+    for task in (whatsapp_watcher_task, instance_owner_watch_task, revocation_sync_task, gateway_monitor_task,
+                 gateway_state_watch_task, cache_invalidation_watch_task, leader_lease_task, leadership_task,
+                 gateway_pool_task, standby_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
     # NOTE: We do NOT stop the gateway on backend shutdown!
     # The gateway is managed by supervisor and should continue running
@@ -1289,4 +2489,7 @@ async def shutdown_db_client():
     # survive backend restarts.
     logger.info("Backend shutting down - gateway will continue running via supervisor")
 
+    supervisor_events.close()
+    await http_clients.close_all()
+
     client.close()
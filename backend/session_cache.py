@@ -0,0 +1,134 @@
+"""
+In-process session cache for authenticated requests.
+
+Resolving a session token costs database round trips, and the Control UI
+proxy resolves one for every asset the browser loads. This module keeps
+resolved sessions in a bounded LRU keyed by session token, with a TTL that
+never outlives the session's own expiry. Concurrent misses for the same
+token share a single database lookup.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """Bounded LRU cache of resolved sessions with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # token -> (value, monotonic deadline)
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _deadline(self, expires_at: Optional[datetime]) -> float:
+        """Compute the monotonic deadline for an entry, capped by session expiry."""
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+            ttl = min(ttl, remaining)
+        return time.monotonic() + ttl
+
+    def get(self, token: str) -> Optional[Any]:
+        """
+        Return the cached value for a token, or None if absent or expired.
+
+        Does not touch the hit/miss counters; use get_or_load for that.
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        value, deadline = entry
+        if deadline <= time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return value
+
+    def put(self, token: str, value: Any, expires_at: Optional[datetime] = None) -> None:
+        """Store a resolved session, evicting the least recently used entry if full."""
+        deadline = self._deadline(expires_at)
+        if deadline <= time.monotonic():
+            return
+        self._entries[token] = (value, deadline)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        token: str,
+        loader: Callable[[], Awaitable[Optional[Tuple[Any, Optional[datetime]]]]],
+    ) -> Optional[Any]:
+        """
+        Return the cached value for a token, loading it on a miss.
+
+        Args:
+            token: The session token.
+            loader: Coroutine factory returning (value, expires_at), or None
+                if the session is invalid. Invalid sessions are not cached.
+
+        Returns:
+            The resolved value, or None if the session is invalid.
+        """
+        value = self.get(token)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # Another request is already resolving this token - share its result
+        pending = self._inflight.get(token)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[token] = future
+        try:
+            result = await loader()
+            value = None
+            if result is not None:
+                value, expires_at = result
+                self.put(token, value, expires_at)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved so waiters-less failures don't warn
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(token, None)
+
+    def evict(self, token: str) -> None:
+        """Drop a single session, e.g. on logout."""
+        self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        """Drop every cached session."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for the metrics endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
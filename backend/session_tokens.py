@@ -0,0 +1,119 @@
+"""
+Stateless signed session tokens.
+
+In signed mode a session token is an HMAC-signed JWT carrying the user's
+identity and expiry, so verifying it is a pure CPU operation with no
+database lookup. Logout is covered by a small revocation list of token
+IDs (jti) that is kept in memory until the revoked tokens would have
+expired anyway.
+"""
+
+import logging
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+
+
+class SignedSessionTokens:
+    """Issue and verify HMAC-signed session tokens with a revocation list."""
+
+    def __init__(self, secret: str):
+        self.secret = secret
+        # jti -> expiry as a unix timestamp
+        self._revoked: dict = {}
+        self.verified = 0
+        self.rejected = 0
+
+    @staticmethod
+    def looks_signed(token: str) -> bool:
+        """Signed tokens are JWTs (three dot-separated parts); opaque tokens are hex."""
+        return token.count(".") == 2
+
+    def issue(self, user_id: str, email: str, name: str, picture: Optional[str], expires_at: datetime) -> str:
+        """Create a signed token for a user that expires at expires_at."""
+        claims = {
+            "sub": user_id,
+            "email": email,
+            "name": name,
+            "picture": picture,
+            "iat": datetime.now(timezone.utc),
+            "exp": expires_at,
+            "jti": secrets.token_hex(16),
+        }
+        return jwt.encode(claims, self.secret, algorithm=ALGORITHM)
+
+    def verify(self, token: str) -> Optional[dict]:
+        """
+        Verify a token's signature, expiry and revocation status.
+
+        Returns:
+            The token claims, or None if the token is invalid, expired or revoked.
+        """
+        try:
+            claims = jwt.decode(
+                token,
+                self.secret,
+                algorithms=[ALGORITHM],
+                options={"require": ["sub", "exp", "jti"]},
+            )
+        except jwt.InvalidTokenError:
+            self.rejected += 1
+            return None
+
+        if claims["jti"] in self._revoked:
+            self.rejected += 1
+            return None
+
+        self.verified += 1
+        return claims
+
+    def revocation_entry(self, token: str) -> Optional[Tuple[str, float]]:
+        """
+        Return (jti, exp) for a token with a valid signature, ignoring expiry.
+
+        Used by logout, which must be able to revoke any token we issued.
+        """
+        try:
+            claims = jwt.decode(
+                token,
+                self.secret,
+                algorithms=[ALGORITHM],
+                options={"verify_exp": False},
+            )
+        except jwt.InvalidTokenError:
+            return None
+        if "jti" not in claims or "exp" not in claims:
+            return None
+        return claims["jti"], float(claims["exp"])
+
+    def revoke(self, jti: str, exp: float) -> None:
+        """Add a token ID to the revocation list until its expiry."""
+        self._prune()
+        self._revoked[jti] = exp
+
+    def load_revocations(self, entries: Iterable[Tuple[str, float]]) -> None:
+        """Merge revocations persisted by other workers or earlier runs."""
+        for jti, exp in entries:
+            self._revoked[jti] = exp
+        self._prune()
+
+    def _prune(self) -> None:
+        """Forget revocations for tokens that have expired on their own."""
+        now = time.time()
+        expired = [jti for jti, exp in self._revoked.items() if exp <= now]
+        for jti in expired:
+            del self._revoked[jti]
+
+    def stats(self) -> dict:
+        return {
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "revoked": len(self._revoked),
+        }
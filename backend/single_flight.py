@@ -0,0 +1,152 @@
+"""
+Collapse concurrent runs of the same expensive operation into one.
+
+Starting the gateway writes its config and env file, asks supervisor to
+start it and then waits up to a minute for it to answer. A double-clicked
+Start button or two open tabs used to run all of that twice, side by side.
+
+SingleFlight makes concurrent callers in one process share a single run:
+the first caller starts it and everyone else awaits the same result (or
+exception). MongoLock extends this across uvicorn workers: the worker
+holding the lock does the work, and the others wait for it to be released
+and then read the outcome from the shared state.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """In-process de-duplication of concurrent calls by key."""
+
+    def __init__(self):
+        self._flights: dict = {}
+        self.runs = 0
+        self.joined = 0
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._flights
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() unless a call with this key is already running, in which case
+        wait for that one instead. Every caller gets the same result.
+
+        The shared run is shielded, so one caller being cancelled (e.g. its
+        client disconnecting) doesn't abort it for the others.
+        """
+        task = self._flights.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.runs += 1
+        else:
+            self.joined += 1
+            logger.info(f"[single-flight] Joining in-flight {key}")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": sorted(self._flights), "runs": self.runs, "joined": self.joined}
+
+
+class MongoLock:
+    """
+    A mutex shared by every process using the same database.
+
+    The lock is a document that exists while it is held. It expires after
+    ttl_seconds, so a process that dies while holding it cannot block the
+    others for longer than that. Work that may outlast the TTL runs
+    alongside keep_renewed().
+    """
+
+    def __init__(self, collection, lock_id: str, ttl_seconds: float = 180.0):
+        """
+        Args:
+            collection: Motor collection holding the lock document.
+            lock_id: The lock document's _id.
+            ttl_seconds: How long the lock is held at most.
+        """
+        self.collection = collection
+        self.lock_id = lock_id
+        self.ttl_seconds = ttl_seconds
+        self._holder: Optional[str] = None
+        self.acquired = 0
+        self.contended = 0
+
+    async def acquire(self) -> bool:
+        """Take the lock if it is free or expired. Returns False if someone else holds it."""
+        now = datetime.now(timezone.utc)
+        holder = uuid.uuid4().hex
+        try:
+            await self.collection.update_one(
+                {"_id": self.lock_id, "expires_at": {"$lt": now}},
+                {"$set": {"holder": holder, "acquired_at": now, "expires_at": now + timedelta(seconds=self.ttl_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The document exists and hasn't expired - held elsewhere
+            self.contended += 1
+            return False
+        self._holder = holder
+        self.acquired += 1
+        return True
+
+    async def renew(self) -> bool:
+        """Push the expiry ttl_seconds out again. Returns False if we no longer hold the lock."""
+        if self._holder is None:
+            return False
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_one(
+            {"_id": self.lock_id, "holder": self._holder},
+            {"$set": {"expires_at": now + timedelta(seconds=self.ttl_seconds)}},
+        )
+        return result.matched_count == 1
+
+    async def keep_renewed(self) -> None:
+        """Renew the lock every third of its TTL until cancelled or the lock is lost."""
+        while True:
+            await asyncio.sleep(self.ttl_seconds / 3)
+            try:
+                renewed = await self.renew()
+            except PyMongoError as e:
+                logger.warning(f"Could not renew lock {self.lock_id}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost lock {self.lock_id} before releasing it")
+                return
+
+    async def release(self) -> None:
+        """Release the lock, if we still hold it."""
+        if self._holder is None:
+            return
+        await self.collection.delete_one({"_id": self.lock_id, "holder": self._holder})
+        self._holder = None
+
+    async def wait_released(self, timeout: float, poll_interval: float = 0.25) -> bool:
+        """Wait until nobody holds the lock. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            held = await self.collection.find_one(
+                {"_id": self.lock_id, "expires_at": {"$gte": datetime.now(timezone.utc)}}, {"_id": 1}
+            )
+            if held is None:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+
+    def stats(self) -> dict:
+        return {"held": self._holder is not None, "acquired": self.acquired, "contended": self.contended}
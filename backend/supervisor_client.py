@@ -3,96 +3,239 @@ Supervisor client for managing the clawdbot gateway process.
 
 This module provides a clean interface for starting, stopping, and
 checking the status of the gateway process managed by supervisord.
+
+It talks to supervisord's XML-RPC interface over a single persistent
+connection (unix socket or http, from SUPERVISOR_SERVER_URL - the same
+variable supervisorctl reads), so a status check is one RPC round trip
+instead of forking supervisorctl. If the RPC endpoint can't be reached,
+calls fall back to running supervisorctl.
 """
 
-import subprocess
+import asyncio
+import http.client
 import logging
+import os
+import socket
+import subprocess
+import threading
+import xmlrpc.client
+from typing import Callable, Optional
 
 logger = logging.getLogger(__name__)
 
+SUPERVISOR_SERVER_URL = os.environ.get("SUPERVISOR_SERVER_URL", "unix:///var/run/supervisor.sock")
+SUPERVISOR_USERNAME = os.environ.get("SUPERVISOR_USERNAME")
+SUPERVISOR_PASSWORD = os.environ.get("SUPERVISOR_PASSWORD")
+SUPERVISOR_RPC_TIMEOUT = float(os.environ.get("SUPERVISOR_RPC_TIMEOUT", "30"))
+
+# supervisor.xmlrpc.Faults codes we handle
+FAULT_BAD_NAME = 10
+FAULT_ALREADY_STARTED = 60
+FAULT_NOT_RUNNING = 70
+
+
+class UnixStreamHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class UnixStreamTransport(xmlrpc.client.Transport):
+    """XML-RPC transport that keeps one HTTP/1.1 connection open on a unix socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__()
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        self._connection = host, UnixStreamHTTPConnection(self.socket_path, self.timeout)
+        return self._connection[1]
+
+
+class TimeoutTransport(xmlrpc.client.Transport):
+    """Keep-alive XML-RPC transport over TCP with a socket timeout."""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
 
 class SupervisorClient:
     """Client for interacting with supervisord to manage the gateway process."""
 
     PROGRAM = "clawdbot-gateway"
 
+    # Callbacks run with the action name ("start", "stop", "restart") after
+    # the gateway process (PROGRAM) has been started, stopped or restarted.
+    # Other programs, such as pooled gateways, don't notify them.
+    _listeners: list = []
+
+    # Shared XML-RPC proxy; xmlrpc.client proxies are not thread-safe
+    _rpc = None
+    _rpc_lock = threading.RLock()
+
+    @classmethod
+    def add_listener(cls, callback: Callable[[str], None]) -> None:
+        """Register a callback for gateway lifecycle changes made through this client."""
+        cls._listeners.append(callback)
+
+    @classmethod
+    def _notify(cls, action: str) -> None:
+        for callback in cls._listeners:
+            try:
+                callback(action)
+            except Exception as e:
+                logger.error(f"Supervisor listener error on {action}: {e}")
+
     @classmethod
-    def start(cls) -> bool:
+    def _is_default(cls, program: Optional[str]) -> bool:
+        return program is None or program == cls.PROGRAM
+
+    # ============== Transport ==============
+
+    @classmethod
+    def _proxy(cls):
+        """Return the shared XML-RPC proxy, connecting lazily."""
+        if cls._rpc is None:
+            credentials = ""
+            if SUPERVISOR_USERNAME:
+                credentials = f"{SUPERVISOR_USERNAME}:{SUPERVISOR_PASSWORD or ''}@"
+
+            if SUPERVISOR_SERVER_URL.startswith("unix://"):
+                transport = UnixStreamTransport(SUPERVISOR_SERVER_URL[len("unix://"):], SUPERVISOR_RPC_TIMEOUT)
+                url = f"http://{credentials}localhost/RPC2"
+            else:
+                transport = TimeoutTransport(SUPERVISOR_RPC_TIMEOUT)
+                scheme, _, rest = SUPERVISOR_SERVER_URL.partition("://")
+                url = f"{scheme}://{credentials}{rest.rstrip('/')}/RPC2"
+            cls._rpc = xmlrpc.client.ServerProxy(url, transport=transport)
+        return cls._rpc
+
+    @classmethod
+    def _call(cls, method: str, *args):
         """
-        Start the gateway via supervisor.
+        Invoke a supervisord XML-RPC method.
 
-        Returns:
-            True if the start command succeeded, False otherwise.
+        Raises:
+            xmlrpc.client.Fault: supervisord rejected the call.
+            OSError / xmlrpc.client.ProtocolError: supervisord is unreachable.
         """
-        try:
-            result = subprocess.run(
-                ['supervisorctl', 'start', cls.PROGRAM],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode == 0:
-                logger.info(f"Started {cls.PROGRAM} via supervisor")
-                return True
-            else:
-                logger.error(f"Failed to start {cls.PROGRAM}: {result.stderr}")
-                return False
-        except subprocess.TimeoutExpired:
-            logger.error(f"Timeout starting {cls.PROGRAM}")
-            return False
-        except Exception as e:
-            logger.error(f"Error starting {cls.PROGRAM}: {e}")
-            return False
+        with cls._rpc_lock:
+            try:
+                return getattr(cls._proxy(), method)(*args)
+            except xmlrpc.client.Fault:
+                raise
+            except (OSError, http.client.HTTPException, xmlrpc.client.ProtocolError):
+                # Drop the connection so the next call reconnects
+                cls._rpc = None
+                raise
 
     @classmethod
-    def stop(cls) -> bool:
+    def _supervisorctl(cls, *args: str, timeout: int = 30) -> subprocess.CompletedProcess:
+        """Fallback for when the XML-RPC interface is unreachable."""
+        return subprocess.run(
+            ['supervisorctl', *args],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+
+    # ============== Process Info ==============
+
+    @classmethod
+    def info(cls, program: Optional[str] = None) -> Optional[dict]:
         """
-        Stop the gateway via supervisor.
+        Get structured process info for the gateway in a single call.
+
+        Args:
+            program: Supervisor program to query. Defaults to PROGRAM.
 
         Returns:
-            True if the stop command succeeded, False otherwise.
+            Dict with state, pid, uptime (seconds), exit_status and spawn_error,
+            or None if supervisor can't be reached or doesn't know the program.
         """
+        program = program or cls.PROGRAM
         try:
-            result = subprocess.run(
-                ['supervisorctl', 'stop', cls.PROGRAM],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode == 0 or 'NOT RUNNING' in result.stdout:
-                logger.info(f"Stopped {cls.PROGRAM} via supervisor")
-                return True
-            else:
-                logger.error(f"Failed to stop {cls.PROGRAM}: {result.stderr}")
-                return False
-        except subprocess.TimeoutExpired:
-            logger.error(f"Timeout stopping {cls.PROGRAM}")
-            return False
+            raw = cls._call("supervisor.getProcessInfo", program)
+        except xmlrpc.client.Fault as e:
+            if e.faultCode != FAULT_BAD_NAME:
+                logger.error(f"Error getting {program} info: {e.faultString}")
+            return None
         except Exception as e:
-            logger.error(f"Error stopping {cls.PROGRAM}: {e}")
-            return False
+            logger.debug(f"Supervisor RPC unavailable ({e}), falling back to supervisorctl")
+            return cls._info_from_supervisorctl(program)
+
+        running = raw["statename"] == "RUNNING"
+        return {
+            "state": raw["statename"],
+            "pid": (raw["pid"] or None) if running else None,
+            "uptime": max(raw["now"] - raw["start"], 0) if running else None,
+            "exit_status": raw["exitstatus"],
+            "spawn_error": raw.get("spawnerr") or None,
+            "description": raw.get("description"),
+        }
 
     @classmethod
-    def status(cls) -> bool:
+    def _info_from_supervisorctl(cls, program: str) -> Optional[dict]:
+        try:
+            result = cls._supervisorctl('status', program, timeout=10)
+        except Exception as e:
+            logger.error(f"Error checking {program} status: {e}")
+            return None
+
+        # Output format: "clawdbot-gateway            RUNNING   pid 12345, uptime 0:01:23"
+        parts = result.stdout.split()
+        if len(parts) < 2 or parts[0] != program:
+            return None
+        state = parts[1]
+        pid = None
+        uptime = None
+        if state == "RUNNING" and 'pid' in result.stdout:
+            try:
+                pid = int(result.stdout.split('pid')[1].strip().split(',')[0].strip())
+                clock = result.stdout.split('uptime')[1].strip()
+                days = 0
+                if 'day' in clock:
+                    day_part, clock = clock.split(',', 1)
+                    days = int(day_part.split()[0])
+                hours, minutes, seconds = (int(x) for x in clock.strip().split(':'))
+                uptime = days * 86400 + hours * 3600 + minutes * 60 + seconds
+            except (IndexError, ValueError):
+                pass
+        return {
+            "state": state,
+            "pid": pid,
+            "uptime": uptime,
+            "exit_status": None,
+            "spawn_error": None,
+            "description": " ".join(parts[2:]) or None,
+        }
+
+    @classmethod
+    def status(cls, program: Optional[str] = None) -> bool:
         """
         Check if the gateway is running via supervisor.
 
         Returns:
             True if the process is running (RUNNING state), False otherwise.
         """
-        try:
-            result = subprocess.run(
-                ['supervisorctl', 'status', cls.PROGRAM],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            # Check for RUNNING state in output
-            # Output format: "clawdbot-gateway            RUNNING   pid 12345, uptime 0:01:23"
-            return 'RUNNING' in result.stdout
-        except Exception as e:
-            logger.error(f"Error checking {cls.PROGRAM} status: {e}")
-            return False
+        info = cls.info(program)
+        return bool(info) and info["state"] == "RUNNING"
 
     @classmethod
     def get_pid(cls) -> int | None:
@@ -102,80 +245,189 @@ class SupervisorClient:
         Returns:
             The PID if running, None otherwise.
         """
+        info = cls.info()
+        return info["pid"] if info else None
+
+    @classmethod
+    def tail_log(cls, offset: int, length: int = 65536, stream: str = "stdout",
+                 program: Optional[str] = None) -> Optional[tuple]:
+        """
+        Read the gateway's log from offset onwards.
+
+        Pass length=0 to only learn the log's current end.
+
+        Returns:
+            (text, next_offset), or None if supervisor can't be reached. If
+            the log grew by more than length bytes, text is its newest part.
+        """
+        program = program or cls.PROGRAM
+        method = "supervisor.tailProcessStdoutLog" if stream == "stdout" else "supervisor.tailProcessStderrLog"
         try:
-            result = subprocess.run(
-                ['supervisorctl', 'status', cls.PROGRAM],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            # Parse PID from output like: "clawdbot-gateway            RUNNING   pid 12345, uptime 0:01:23"
-            if 'RUNNING' in result.stdout and 'pid' in result.stdout:
-                # Extract pid number
-                parts = result.stdout.split('pid')
-                if len(parts) > 1:
-                    pid_part = parts[1].strip().split(',')[0].strip()
-                    return int(pid_part)
-            return None
+            text, next_offset, _ = cls._call(method, program, offset, length)
         except Exception as e:
-            logger.error(f"Error getting {cls.PROGRAM} PID: {e}")
+            logger.debug(f"Could not read {program} {stream} log: {e}")
             return None
+        return text, next_offset
+
+    # ============== Process Control ==============
 
     @classmethod
-    def restart(cls) -> bool:
+    def _start(cls, program: Optional[str] = None) -> bool:
+        """Start the gateway without notifying listeners. Blocking."""
+        program = program or cls.PROGRAM
+        try:
+            cls._call("supervisor.startProcess", program, True)
+        except xmlrpc.client.Fault as e:
+            if e.faultCode != FAULT_ALREADY_STARTED:
+                logger.error(f"Failed to start {program}: {e.faultString}")
+                return False
+        except Exception as e:
+            logger.debug(f"Supervisor RPC unavailable ({e}), falling back to supervisorctl")
+            try:
+                result = cls._supervisorctl('start', program)
+                if result.returncode != 0:
+                    logger.error(f"Failed to start {program}: {result.stderr}")
+                    return False
+            except subprocess.TimeoutExpired:
+                logger.error(f"Timeout starting {program}")
+                return False
+            except Exception as e:
+                logger.error(f"Error starting {program}: {e}")
+                return False
+
+        logger.info(f"Started {program} via supervisor")
+        return True
+
+    @classmethod
+    def _stop(cls, program: Optional[str] = None) -> bool:
+        """Stop the gateway without notifying listeners. Blocking."""
+        program = program or cls.PROGRAM
+        try:
+            cls._call("supervisor.stopProcess", program, True)
+        except xmlrpc.client.Fault as e:
+            if e.faultCode != FAULT_NOT_RUNNING:
+                logger.error(f"Failed to stop {program}: {e.faultString}")
+                return False
+        except Exception as e:
+            logger.debug(f"Supervisor RPC unavailable ({e}), falling back to supervisorctl")
+            try:
+                result = cls._supervisorctl('stop', program)
+                if result.returncode != 0 and 'NOT RUNNING' not in result.stdout:
+                    logger.error(f"Failed to stop {program}: {result.stderr}")
+                    return False
+            except subprocess.TimeoutExpired:
+                logger.error(f"Timeout stopping {program}")
+                return False
+            except Exception as e:
+                logger.error(f"Error stopping {program}: {e}")
+                return False
+
+        logger.info(f"Stopped {program} via supervisor")
+        return True
+
+    @classmethod
+    def _restart(cls, program: Optional[str] = None) -> bool:
+        """Restart the gateway without notifying listeners. Blocking."""
+        program = program or cls.PROGRAM
+        try:
+            try:
+                cls._call("supervisor.stopProcess", program, True)
+            except xmlrpc.client.Fault as e:
+                if e.faultCode != FAULT_NOT_RUNNING:
+                    raise
+            cls._call("supervisor.startProcess", program, True)
+        except xmlrpc.client.Fault as e:
+            logger.error(f"Failed to restart {program}: {e.faultString}")
+            return False
+        except Exception as e:
+            logger.debug(f"Supervisor RPC unavailable ({e}), falling back to supervisorctl")
+            try:
+                result = cls._supervisorctl('restart', program)
+                if result.returncode != 0:
+                    logger.error(f"Failed to restart {program}: {result.stderr}")
+                    return False
+            except subprocess.TimeoutExpired:
+                logger.error(f"Timeout restarting {program}")
+                return False
+            except Exception as e:
+                logger.error(f"Error restarting {program}: {e}")
+                return False
+
+        logger.info(f"Restarted {program} via supervisor")
+        return True
+
+    @classmethod
+    def start(cls, program: Optional[str] = None) -> bool:
+        """
+        Start the gateway via supervisor.
+
+        Returns:
+            True if the start command succeeded, False otherwise.
+        """
+        started = cls._start(program)
+        if started and cls._is_default(program):
+            cls._notify("start")
+        return started
+
+    @classmethod
+    def stop(cls, program: Optional[str] = None) -> bool:
+        """
+        Stop the gateway via supervisor.
+
+        Returns:
+            True if the stop command succeeded, False otherwise.
+        """
+        stopped = cls._stop(program)
+        if stopped and cls._is_default(program):
+            cls._notify("stop")
+        return stopped
+
+    @classmethod
+    def restart(cls, program: Optional[str] = None) -> bool:
         """
         Restart the gateway via supervisor.
 
         Returns:
             True if the restart command succeeded, False otherwise.
         """
-        try:
-            result = subprocess.run(
-                ['supervisorctl', 'restart', cls.PROGRAM],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode == 0:
-                logger.info(f"Restarted {cls.PROGRAM} via supervisor")
-                return True
-            else:
-                logger.error(f"Failed to restart {cls.PROGRAM}: {result.stderr}")
-                return False
-        except subprocess.TimeoutExpired:
-            logger.error(f"Timeout restarting {cls.PROGRAM}")
-            return False
-        except Exception as e:
-            logger.error(f"Error restarting {cls.PROGRAM}: {e}")
-            return False
+        restarted = cls._restart(program)
+        if restarted and cls._is_default(program):
+            cls._notify("restart")
+        return restarted
 
     @classmethod
     def reload_config(cls) -> bool:
         """
         Reload supervisor configuration.
 
-        Call this after modifying supervisor config files.
+        Call this after modifying supervisor config files. Equivalent to
+        `supervisorctl reread` followed by `supervisorctl update`.
 
         Returns:
             True if reload succeeded, False otherwise.
         """
         try:
-            result = subprocess.run(
-                ['supervisorctl', 'reread'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            added, changed, removed = cls._call("supervisor.reloadConfig")[0]
+            for group in removed + changed:
+                cls._call("supervisor.stopProcessGroup", group)
+                cls._call("supervisor.removeProcessGroup", group)
+            for group in changed + added:
+                cls._call("supervisor.addProcessGroup", group)
+            logger.info("Supervisor configuration reloaded")
+            return True
+        except xmlrpc.client.Fault as e:
+            logger.error(f"Failed to reload supervisor config: {e.faultString}")
+            return False
+        except Exception as e:
+            logger.debug(f"Supervisor RPC unavailable ({e}), falling back to supervisorctl")
+
+        try:
+            result = cls._supervisorctl('reread', timeout=10)
             if result.returncode != 0:
                 logger.error(f"Failed to reread supervisor config: {result.stderr}")
                 return False
 
-            result = subprocess.run(
-                ['supervisorctl', 'update'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            result = cls._supervisorctl('update', timeout=10)
             if result.returncode != 0:
                 logger.error(f"Failed to update supervisor: {result.stderr}")
                 return False
@@ -185,3 +437,60 @@ class SupervisorClient:
         except Exception as e:
             logger.error(f"Error reloading supervisor config: {e}")
             return False
+
+    # ============== Async API ==============
+    #
+    # Supervisor calls can block for up to SUPERVISOR_RPC_TIMEOUT (or the
+    # supervisorctl timeout). Async handlers must use these variants, which run
+    # the call in a worker thread so the event loop - and every open proxy and
+    # WebSocket relay on it - keeps running. Listeners still run on the loop.
+
+    @classmethod
+    async def ainfo(cls, program: Optional[str] = None) -> Optional[dict]:
+        """Async variant of info()."""
+        return await asyncio.to_thread(cls.info, program)
+
+    @classmethod
+    async def astatus(cls, program: Optional[str] = None) -> bool:
+        """Async variant of status()."""
+        return await asyncio.to_thread(cls.status, program)
+
+    @classmethod
+    async def aget_pid(cls) -> int | None:
+        """Async variant of get_pid()."""
+        return await asyncio.to_thread(cls.get_pid)
+
+    @classmethod
+    async def atail_log(cls, offset: int, length: int = 65536, stream: str = "stdout",
+                        program: Optional[str] = None) -> Optional[tuple]:
+        """Async variant of tail_log()."""
+        return await asyncio.to_thread(cls.tail_log, offset, length, stream, program)
+
+    @classmethod
+    async def astart(cls, program: Optional[str] = None) -> bool:
+        """Async variant of start()."""
+        started = await asyncio.to_thread(cls._start, program)
+        if started and cls._is_default(program):
+            cls._notify("start")
+        return started
+
+    @classmethod
+    async def astop(cls, program: Optional[str] = None) -> bool:
+        """Async variant of stop()."""
+        stopped = await asyncio.to_thread(cls._stop, program)
+        if stopped and cls._is_default(program):
+            cls._notify("stop")
+        return stopped
+
+    @classmethod
+    async def arestart(cls, program: Optional[str] = None) -> bool:
+        """Async variant of restart()."""
+        restarted = await asyncio.to_thread(cls._restart, program)
+        if restarted and cls._is_default(program):
+            cls._notify("restart")
+        return restarted
+
+    @classmethod
+    async def areload_config(cls) -> bool:
+        """Async variant of reload_config()."""
+        return await asyncio.to_thread(cls.reload_config)
@@ -0,0 +1,199 @@
+"""
+Push-based gateway process events from supervisord.
+
+supervisord can run "event listener" programs that it notifies of process
+state changes. Running this module as one forwards every PROCESS_STATE_*
+event for the gateway to the backend as a JSON datagram on a local unix
+socket, so the backend reacts to a crash or restart within milliseconds
+instead of at its next poll. Datagrams are fire-and-forget: if the backend
+is down, events are dropped and the listener never blocks supervisord.
+
+Supervisor configuration:
+
+    [eventlistener:clawdbot-gateway-events]
+    command=python3 /app/backend/supervisor_events.py
+    events=PROCESS_STATE
+    buffer_size=100
+    autorestart=true
+    stderr_logfile=/var/log/supervisor/clawdbot-gateway-events.err.log
+
+The backend side is SupervisorEventReceiver, which binds the socket and
+hands each event to a callback. The socket lives in a directory only its
+owner can enter and is itself owner-only, so other local users can neither
+inject events nor see them.
+
+This module must only import the standard library at the top level: the
+listener runs under whatever python3 supervisord finds, outside the
+backend's virtualenv.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_EVENT_SOCKET = os.environ.get("SUPERVISOR_EVENT_SOCKET", "/run/clawdbot/supervisor-events.sock")
+
+# Only events for these supervisor process names are forwarded
+EVENT_PROGRAMS = set(os.environ.get("SUPERVISOR_EVENT_PROGRAMS", "clawdbot-gateway").split(","))
+
+
+def parse_tokens(line: str) -> dict:
+    """Parse supervisor's space separated "key:value" header and payload format."""
+    return dict(token.split(":", 1) for token in line.split() if ":" in token)
+
+
+# ============== Listener (runs under supervisord) ==============
+
+def main(stdin=sys.stdin, stdout=sys.stdout, socket_path: str = SUPERVISOR_EVENT_SOCKET) -> None:
+    """Speak the supervisor event listener protocol and forward gateway events."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+
+    while True:
+        stdout.write("READY\n")
+        stdout.flush()
+
+        line = stdin.readline()
+        if not line:
+            return
+        headers = parse_tokens(line)
+        payload_line = stdin.read(int(headers.get("len", 0)))
+        # The payload's first line holds the tokens; PROCESS_COMMUNICATION events append data
+        payload = parse_tokens(payload_line.split("\n", 1)[0])
+
+        event_name = headers.get("eventname", "")
+        if event_name.startswith("PROCESS_STATE_") and payload.get("processname") in EVENT_PROGRAMS:
+            message = {
+                "event": event_name,
+                "process": payload.get("processname"),
+                "from_state": payload.get("from_state"),
+                "pid": int(payload["pid"]) if payload.get("pid", "").isdigit() else None,
+                "expected": payload.get("expected") == "1" if "expected" in payload else None,
+                "serial": headers.get("serial"),
+                "sent_at": time.time(),
+            }
+            try:
+                sock.sendto(json.dumps(message).encode(), socket_path)
+            except OSError as e:
+                # Backend not listening (or its buffer is full) - it will catch up by polling
+                sys.stderr.write(f"Could not forward {event_name}: {e}\n")
+                sys.stderr.flush()
+
+        stdout.write("RESULT 2\nOK")
+        stdout.flush()
+
+
+# ============== Receiver (runs in the backend) ==============
+
+class _EventProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver: "SupervisorEventReceiver"):
+        self.receiver = receiver
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.receiver._handle(data)
+
+
+class SupervisorEventReceiver:
+    """Bind the event socket and pass each decoded event to a callback."""
+
+    def __init__(self, callback: Callable[[dict], None], socket_path: str = SUPERVISOR_EVENT_SOCKET):
+        self.callback = callback
+        self.socket_path = socket_path
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._lock_fd: Optional[int] = None
+        self.received = 0
+        self.errors = 0
+        self.last_event_at: Optional[float] = None
+
+    def _lock(self) -> bool:
+        """
+        Take the lock that makes this process the socket's owner.
+
+        The lock is released by the kernel when its holder exits, so a socket
+        file left behind by a crashed process can safely be replaced by
+        whoever holds it next.
+        """
+        fd = os.open(f"{self.socket_path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _unlock(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def start(self) -> bool:
+        """
+        Start listening. Returns False if the socket could not be bound.
+
+        Only one process receives the events: when several workers start, the
+        first one binds the socket and the others rely on polling.
+        """
+        try:
+            directory = os.path.dirname(self.socket_path)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            os.chmod(directory, 0o700)
+            if not self._lock():
+                logger.info(f"Supervisor events socket {self.socket_path} is served by another process")
+                return False
+            if os.path.exists(self.socket_path):
+                # Left by an owner that exited without closing
+                os.unlink(self.socket_path)
+            self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _EventProtocol(self),
+                local_addr=self.socket_path,
+                family=socket.AF_UNIX,
+            )
+            os.chmod(self.socket_path, 0o600)
+        except OSError as e:
+            logger.warning(f"Supervisor events unavailable, relying on polling: {e}")
+            self.close()
+            return False
+        logger.info(f"Listening for supervisor events on {self.socket_path}")
+        return True
+
+    def close(self) -> None:
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        self._unlock()
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            event = json.loads(data)
+            self.received += 1
+            self.last_event_at = time.time()
+            self.callback(event)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error handling supervisor event: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._transport is not None,
+            "received": self.received,
+            "errors": self.errors,
+            # How long ago supervisor sent the most recent event
+            "last_event_age_seconds": round(time.time() - self.last_event_at, 3) if self.last_event_at else None,
+        }
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,131 @@
 """WhatsApp Fix - Handles Baileys registered=false bug"""
 
+import asyncio
 import json
 import logging
+import os
+from contextlib import aclosing
 from pathlib import Path
+from typing import AsyncIterator, Optional
+
+try:
+    import watchfiles
+except ImportError:  # watchfiles is optional - fall back to stat polling
+    watchfiles = None
 
 logger = logging.getLogger(__name__)
 
 CREDS_FILE = Path.home() / ".clawdbot/credentials/whatsapp/default/creds.json"
 
-def fix_registered_flag() -> bool:
-    """Fix Baileys registered=false bug. Returns True if fix applied."""
-    logger.info(f"[WhatsApp Monitor] Starting fix_registered_flag check...")
-    logger.info(f"[WhatsApp Monitor] Checking credentials file: {CREDS_FILE}")
+# With change notifications, a slow safety-net poll; without them, the stat poll interval
+WHATSAPP_FALLBACK_POLL_SECONDS = float(os.environ.get("WHATSAPP_FALLBACK_POLL_SECONDS", "60"))
+WHATSAPP_STAT_POLL_SECONDS = float(os.environ.get("WHATSAPP_STAT_POLL_SECONDS", "5"))
+
+NOT_LINKED = {"linked": False, "phone": None, "registered": False}
 
-    if not CREDS_FILE.exists():
-        logger.info(f"[WhatsApp Monitor] Credentials file does not exist - no WhatsApp linked yet")
-        return False
 
+def _file_signature(path: Path) -> Optional[tuple]:
+    """Cheap change detector: (mtime_ns, size, inode), or None if the file is missing."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class _CredsCache:
+    """
+    Parsed state of creds.json, keyed by the file's (mtime_ns, size, inode).
+
+    Only the fields needed for status and the registered fix are kept - not
+    the key material - so repeated status calls only stat the file.
+    """
+
+    def __init__(self):
+        self.signature: Optional[tuple] = None
+        self.state: Optional[dict] = None
+        self.hits = 0
+        self.misses = 0
+
+    def store(self, signature: Optional[tuple], creds: Optional[dict]) -> dict:
+        if creds is None:
+            state = {**NOT_LINKED, "has_me": False}
+        else:
+            jid = creds.get("me", {}).get("id", "")
+            state = {
+                "linked": bool(creds.get("account")),
+                "phone": "+" + jid.split(":")[0] if ":" in jid else None,
+                "registered": creds.get("registered", False),
+                "has_me": bool(jid),
+                "phone_id": jid or "unknown",
+            }
+        self.signature = signature
+        self.state = state
+        return state
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+creds_cache = _CredsCache()
+
+
+def _read_creds() -> Optional[dict]:
+    """Parse creds.json and refresh the cache from it. Returns None if there is no file."""
     try:
-        logger.info(f"[WhatsApp Monitor] Reading credentials file...")
         with open(CREDS_FILE, 'r') as f:
+            # Key the cache on the file we actually read, not an earlier stat
+            signature = os.fstat(f.fileno())
             creds = json.load(f)
+    except FileNotFoundError:
+        creds_cache.store(None, None)
+        return None
+    creds_cache.store((signature.st_mtime_ns, signature.st_size, signature.st_ino), creds)
+    return creds
+
+
+def _creds_state() -> dict:
+    """Cached credential state, re-parsing creds.json only if it changed on disk."""
+    signature = _file_signature(CREDS_FILE)
+    if creds_cache.state is not None and signature == creds_cache.signature:
+        creds_cache.hits += 1
+        return creds_cache.state
+    creds_cache.misses += 1
+    if signature is None:
+        return creds_cache.store(None, None)
+    _read_creds()
+    return creds_cache.state
 
-        has_account = bool(creds.get("account"))
-        has_me = bool(creds.get("me", {}).get("id"))
-        registered = creds.get("registered", False)
 
-        logger.info(f"[WhatsApp Monitor] Credential state: has_account={has_account}, has_me={has_me}, registered={registered}")
+def fix_registered_flag() -> bool:
+    """Fix Baileys registered=false bug. Returns True if fix applied."""
+    logger.debug(f"[WhatsApp Monitor] Checking credentials file: {CREDS_FILE}")
+
+    try:
+        state = _creds_state()
+        has_account, has_me, registered = state["linked"], state["has_me"], state["registered"]
+        logger.debug(f"[WhatsApp Monitor] Credential state: has_account={has_account}, has_me={has_me}, registered={registered}")
 
         if has_account and has_me:
-            phone_id = creds.get("me", {}).get("id", "unknown")
-            logger.info(f"[WhatsApp Monitor] WhatsApp account found: {phone_id}")
+            phone_id = state["phone_id"]
+            logger.debug(f"[WhatsApp Monitor] WhatsApp account found: {phone_id}")
 
             if not registered:
                 logger.info(f"[WhatsApp Monitor] DETECTED registered=false bug! Fixing...")
+                # The rewrite needs the full file, key material included
+                creds = _read_creds()
+                if creds is None:
+                    return False
                 creds["registered"] = True
                 with open(CREDS_FILE, 'w') as f:
                     json.dump(creds, f)
+                creds_cache.store(_file_signature(CREDS_FILE), creds)
                 logger.info(f"[WhatsApp Monitor] SUCCESS: Fixed registered=false for {phone_id}")
                 return True
             else:
-                logger.info(f"[WhatsApp Monitor] registered=true already set, no fix needed")
+                logger.debug(f"[WhatsApp Monitor] registered=true already set, no fix needed")
         else:
-            logger.info(f"[WhatsApp Monitor] Incomplete credentials - has_account={has_account}, has_me={has_me}")
+            logger.debug(f"[WhatsApp Monitor] Incomplete credentials - has_account={has_account}, has_me={has_me}")
 
     except Exception as e:
         logger.error(f"[WhatsApp Monitor] ERROR reading/fixing credentials: {e}")
@@ -51,28 +134,74 @@ def fix_registered_flag() -> bool:
 
 def get_whatsapp_status() -> dict:
     """Get basic WhatsApp status."""
-    logger.info(f"[WhatsApp Monitor] Getting WhatsApp status...")
-
-    if not CREDS_FILE.exists():
-        logger.info(f"[WhatsApp Monitor] No credentials file - WhatsApp not linked")
-        return {"linked": False, "phone": None, "registered": False}
-
     try:
-        with open(CREDS_FILE, 'r') as f:
-            creds = json.load(f)
-
-        jid = creds.get("me", {}).get("id", "")
-        phone = "+" + jid.split(":")[0] if ":" in jid else None
-        linked = bool(creds.get("account"))
-        registered = creds.get("registered", False)
-
+        state = _creds_state()
         status = {
-            "linked": linked,
-            "phone": phone,
-            "registered": registered
+            "linked": state["linked"],
+            "phone": state["phone"],
+            "registered": state["registered"]
         }
-        logger.info(f"[WhatsApp Monitor] Status: {status}")
+        logger.debug(f"[WhatsApp Monitor] Status: {status}")
         return status
     except Exception as e:
         logger.error(f"[WhatsApp Monitor] ERROR getting status: {e}")
-        return {"linked": False, "phone": None, "registered": False}
+        return dict(NOT_LINKED)
+
+
+def _watch_root(path: Path) -> Path:
+    """Deepest existing directory on the way to path - creds.json's directory only appears once WhatsApp is linked."""
+    directory = path.parent
+    while not directory.exists() and directory != directory.parent:
+        directory = directory.parent
+    return directory
+
+
+async def watch_file(path: Path) -> AsyncIterator[None]:
+    """
+    Yield once at start and then whenever path is created, modified or deleted.
+
+    Uses filesystem change notifications (inotify on Linux) through watchfiles
+    when it is installed, with a slow fallback poll in case notifications are
+    lost; otherwise polls os.stat. The file is never opened here, and changes
+    that leave its mtime, size and inode untouched are not reported.
+    """
+    signature = _file_signature(path)
+    yield
+
+    target = str(path)
+    while True:
+        if watchfiles:
+            root = _watch_root(path)
+            # The file may have appeared while the previous watch was torn down
+            current = _file_signature(path)
+            if current != signature:
+                signature = current
+                yield
+            try:
+                # Only root itself is watched, never its subtree: until creds.json's
+                # directory exists, the one event of interest is the next directory
+                # on the way to it being created, and then the watch moves down
+                async with aclosing(watchfiles.awatch(
+                    root,
+                    watch_filter=lambda change, changed: changed == target or target.startswith(changed + os.sep),
+                    rust_timeout=int(WHATSAPP_FALLBACK_POLL_SECONDS * 1000),
+                    yield_on_timeout=True,
+                    recursive=False,
+                )) as changes:
+                    async for _ in changes:
+                        current = _file_signature(path)
+                        if current != signature:
+                            signature = current
+                            yield
+                        if root != _watch_root(path):
+                            # A missing directory appeared (or vanished) - watch from the new root
+                            break
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"[WhatsApp Monitor] File watch on {root} failed, retrying: {e}")
+                await asyncio.sleep(WHATSAPP_STAT_POLL_SECONDS)
+        else:
+            await asyncio.sleep(WHATSAPP_STAT_POLL_SECONDS)
+            current = _file_signature(path)
+            if current != signature:
+                signature = current
+                yield
@@ -1,4 +1,4 @@
-import React, { useMemo, useState, useEffect } from 'react';
+import React, { useMemo, useState, useEffect, useRef } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { Button } from '@/components/ui/button';
@@ -14,6 +14,17 @@ import OpenClaw from '@/components/ui/icons/OpenClaw';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
 const API = `${BACKEND_URL}/api`;
 
+// Progress shown for each stage pushed by the backend while /openclaw/start runs
+const START_STAGE_PROGRESS = {
+  validating: 20,
+  installing: 30,
+  configuring: 40,
+  recovering: 40,
+  starting: 55,
+  waiting_ready: 70,
+  ready: 90
+};
+
 export default function SetupPage() {
   const navigate = useNavigate();
   const location = useLocation();
@@ -29,6 +40,8 @@ export default function SetupPage() {
   const [progress, setProgress] = useState(0);
   const [status, setStatus] = useState(null);
   const [checkingStatus, setCheckingStatus] = useState(true);
+  const [whatsapp, setWhatsapp] = useState(null);
+  const startingRef = useRef(false);
 
   // Check auth on mount (if not passed from AuthCallback)
   useEffect(() => {
@@ -57,6 +70,26 @@ export default function SetupPage() {
     checkAuth();
   }, [navigate, location.state]);
 
+  // Gateway state, start progress and WhatsApp status are pushed by the backend
+  useEffect(() => {
+    if (!isAuthenticated) return;
+
+    const events = new EventSource(`${API}/openclaw/events`, { withCredentials: true });
+    events.addEventListener('gateway', (e) => {
+      setStatus(JSON.parse(e.data));
+    });
+    events.addEventListener('start', (e) => {
+      const { stage } = JSON.parse(e.data);
+      if (startingRef.current && START_STAGE_PROGRESS[stage]) {
+        setProgress(prev => Math.max(prev, START_STAGE_PROGRESS[stage]));
+      }
+    });
+    events.addEventListener('whatsapp', (e) => {
+      setWhatsapp(JSON.parse(e.data));
+    });
+    return () => events.close();
+  }, [isAuthenticated]);
+
   const checkOpenClawStatus = async () => {
     setCheckingStatus(true);
     try {
@@ -152,14 +185,7 @@ export default function SetupPage() {
     try {
       setLoading(true);
       setProgress(15);
-
-      // Simulate progress while waiting
-      const progressInterval = setInterval(() => {
-        setProgress(prev => {
-          if (prev < 80) return prev + Math.random() * 10;
-          return prev;
-        });
-      }, 500);
+      startingRef.current = true;
 
       const payload = { provider };
       if (provider !== 'emergent' && apiKey) {
@@ -173,7 +199,7 @@ export default function SetupPage() {
         body: JSON.stringify(payload)
       });
 
-      clearInterval(progressInterval);
+      startingRef.current = false;
 
       if (!res.ok) {
         const data = await res.json().catch(() => ({ detail: 'Startup failed' }));
@@ -200,6 +226,7 @@ export default function SetupPage() {
       console.error(e);
       setError(e.message || 'Unable to start OpenClaw');
       toast.error('Startup error: ' + (e.message || 'Unknown error'));
+      startingRef.current = false;
       setLoading(false);
       setProgress(0);
     }
@@ -312,6 +339,11 @@ export default function SetupPage() {
                 <p className="text-zinc-400 text-sm mb-4">
                   Provider: <span className="text-zinc-200 capitalize">{status.provider}</span>
                 </p>
+                {whatsapp?.linked && (
+                  <p className="text-zinc-400 text-sm mb-4" data-testid="whatsapp-status">
+                    WhatsApp: <span className="text-zinc-200">{whatsapp.phone || 'linked'}</span>
+                  </p>
+                )}
                 <div className="flex gap-3">
                   <Button
                     onClick={goToControlUI}
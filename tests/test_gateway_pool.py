@@ -0,0 +1,267 @@
+"""Tests for the per-user gateway pool."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import ReturnDocument
+
+import gateway_pool
+from gateway_pool import GatewayPool, parse_port_range
+
+
+def test_parse_port_range():
+    assert parse_port_range("18800-18803") == [18800, 18801, 18802, 18803]
+    assert parse_port_range("18805, 18800-18801,,18801") == [18800, 18801, 18805]
+    assert parse_port_range("") == []
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(field)
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$lt" in condition and (value is None or not value < condition["$lt"]):
+                return False
+            if "$gt" in condition and (value is None or not value > condition["$gt"]):
+                return False
+            if "$not" in condition and _matches(doc, {field: condition["$not"]}):
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeCollection:
+    """The subset of a Motor collection the pool uses, kept in memory."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            port = request._filter["_id"]
+            self.docs.setdefault(port, {"_id": port, **request._doc["$setOnInsert"]})
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs.values() if _matches(doc, query)), None)
+
+    def find(self, query):
+        return _Cursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    async def update_one(self, query, update):
+        for doc in self.docs.values():
+            if _matches(doc, query):
+                doc.update(update["$set"])
+                return
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=ReturnDocument.BEFORE):
+        candidates = [doc for doc in self.docs.values() if _matches(doc, query)]
+        for field, _ in reversed(sort or []):
+            # Ascending, with nulls first as in MongoDB
+            candidates.sort(key=lambda doc: (doc.get(field) is not None, doc.get(field) or 0))
+        if not candidates:
+            return None
+        doc = candidates[0]
+        before = dict(doc)
+        doc.update(update["$set"])
+        return before if return_document == ReturnDocument.BEFORE else dict(doc)
+
+
+@pytest.fixture
+def stopped(monkeypatch):
+    stopped = []
+
+    async def astop(program=None):
+        stopped.append(program)
+        return True
+
+    async def areload_config():
+        return True
+
+    async def ainfo(program=None):
+        return {"state": "STOPPED", "pid": None, "uptime": None}
+
+    monkeypatch.setattr(gateway_pool.SupervisorClient, "astop", astop)
+    monkeypatch.setattr(gateway_pool.SupervisorClient, "ainfo", ainfo)
+    monkeypatch.setattr(gateway_pool.SupervisorClient, "areload_config", areload_config)
+    return stopped
+
+
+def _pool(tmp_path, ports="18800-18802"):
+    return GatewayPool(
+        FakeCollection(), parse_port_range(ports), root=str(tmp_path), command="gateway",
+        supervisor_conf=str(tmp_path / "pool.conf"), min_idle_seconds=300
+    )
+
+
+def _age(pool, port, seconds):
+    pool.collection.docs[port]["last_used_at"] = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+async def _started(pool, slot, **fields):
+    """Mark a slot's gateway started, as start_pool_gateway does."""
+    return await pool.update(slot["_id"], slot["user_id"], running=True, busy_until=None, **fields)
+
+
+def test_setup_writes_programs(tmp_path, stopped):
+    pool = _pool(tmp_path)
+    asyncio.run(pool.setup())
+    assert sorted(pool.collection.docs) == [18800, 18801, 18802]
+    assert "[program:clawdbot-gateway-18801]" in (tmp_path / "pool.conf").read_text()
+
+
+def test_acquire_returns_existing_slot(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.setup()
+        first = await pool.acquire("a")
+        return first, await pool.acquire("a")
+
+    first, again = asyncio.run(main())
+    assert first["_id"] == again["_id"]
+
+
+def test_acquire_eviction_order(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.setup()
+        evicted = []
+        pool.add_listener(lambda user_id, slot: slot is None and evicted.append(user_id))
+
+        # Free slots first
+        for user_id in ("a", "b", "c"):
+            slot = await pool.acquire(user_id)
+            await _started(pool, slot)
+        ports = {user_id: (await pool.get(user_id, fresh=True))["_id"] for user_id in "abc"}
+
+        # Every gateway was used recently: nothing can be evicted
+        assert await pool.acquire("d") is None
+
+        # A stopped gateway is taken before an idle running one
+        _age(pool, ports["a"], 1000)
+        _age(pool, ports["b"], 600)
+        await pool.update(ports["c"], "c", running=False)
+        slot = await pool.acquire("d")
+        assert slot["_id"] == ports["c"]
+        await _started(pool, slot)
+
+        # Then the least recently used idle gateway, which is stopped
+        slot = await pool.acquire("e")
+        assert slot["_id"] == ports["a"]
+        await _started(pool, slot)
+        assert (await pool.acquire("f"))["_id"] == ports["b"]
+        return ports, evicted, pool.stats()
+
+    ports, evicted, stats = asyncio.run(main())
+    assert evicted == ["c", "a", "b"]
+    assert stopped == [GatewayPool.program(ports[user_id]) for user_id in ("c", "a", "b")]
+    assert stats["evictions"] == 3
+
+
+def test_evict_idle(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path)
+        pool.idle_seconds = 60
+        await pool.setup()
+        for user_id in ("a", "b"):
+            slot = await pool.acquire(user_id)
+            await _started(pool, slot)
+        idle_port = (await pool.get("a", fresh=True))["_id"]
+        _age(pool, idle_port, 120)
+        return await pool.evict_idle(), await pool.get("a", fresh=True), idle_port
+
+    count, slot, idle_port = asyncio.run(main())
+    assert count == 1
+    # The user keeps the slot; only the gateway is stopped
+    assert slot["_id"] == idle_port and slot["running"] is False
+    assert stopped == [GatewayPool.program(idle_port)]
+
+
+def test_linked_channels_keep_a_gateway_in_use(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path, "18800")
+        pool.idle_seconds = 60
+        await pool.setup()
+        slot = await pool.acquire("a")
+        await _started(pool, slot)
+        _age(pool, slot["_id"], 1000)
+        creds = tmp_path / "users" / "a" / ".clawdbot" / "credentials" / "whatsapp" / "default" / "creds.json"
+        creds.parent.mkdir(parents=True)
+        creds.write_text("{}")
+        return await pool.acquire("b"), await pool.evict_idle()
+
+    assert asyncio.run(main()) == (None, 0)
+    assert stopped == []
+
+
+def test_setup_marks_stopped_programs(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path)
+        await pool.setup()
+        slot = await pool.acquire("a")
+        await _started(pool, slot, token="t")
+        # e.g. the container restarted: supervisor doesn't autostart pooled gateways
+        await pool.setup()
+        return await pool.get("a", fresh=True)
+
+    slot = asyncio.run(main())
+    assert slot["running"] is False and slot["token"] is None
+
+
+def test_slot_being_started_is_not_reassigned(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path, "18800")
+        await pool.setup()
+        slot = await pool.acquire("a")
+        # a's gateway is still starting: the slot is not running yet, but not free either
+        taken_while_starting = await pool.acquire("b")
+        await pool.update(slot["_id"], "a", busy_until=None)
+        taken_after_start = await pool.acquire("b")
+        # a late update or stop from a's start leaves b's slot alone
+        return taken_while_starting, taken_after_start, await _started(pool, slot), await pool.stop(slot)
+
+    taken_while_starting, taken_after_start, updated, stopped_late = asyncio.run(main())
+    assert taken_while_starting is None
+    assert taken_after_start["user_id"] == "b"
+    assert updated is None and stopped_late is False
+    # Only the hand-over to b stopped the program
+    assert stopped == [GatewayPool.program(18800)]
+
+
+def test_refresh_monitor_in_background(tmp_path, stopped):
+    async def main():
+        pool = _pool(tmp_path, "18800")
+        monitor = pool.refresh_monitor(18800)
+        pool.refresh_monitor(18800)
+        refreshed_before = monitor.refreshes
+        await asyncio.sleep(0.01)
+        # Fresh snapshot: served as is
+        pool.refresh_monitor(18800)
+        await asyncio.sleep(0.01)
+        return refreshed_before, monitor.refreshes, monitor.state
+
+    assert asyncio.run(main()) == (0, 1, "STOPPED")
+
+
+def test_stop_local(tmp_path, stopped, monkeypatch):
+    async def ainfo(program=None):
+        running = program == GatewayPool.program(18801)
+        return {"state": "RUNNING" if running else "STOPPED", "pid": None, "uptime": None}
+
+    monkeypatch.setattr(gateway_pool.SupervisorClient, "ainfo", ainfo)
+    pool = _pool(tmp_path)
+    assert asyncio.run(pool.stop_local()) == 1
+    assert stopped == [GatewayPool.program(18801)]
@@ -0,0 +1,56 @@
+"""Tests for the streaming HTML script injector."""
+
+import asyncio
+
+from html_injector import HtmlScriptInjector, inject_script
+
+SCRIPT = b"<script>x</script>"
+
+
+def _feed(chunks, **kwargs):
+    injector = HtmlScriptInjector(SCRIPT, **kwargs)
+    return [injector.feed(chunk) for chunk in chunks] + [injector.finish()]
+
+
+def test_head_close_split_across_chunks():
+    out = _feed([b"<html><head><title>t</title></he", b"ad><body>hi</body></html>"])
+    assert out[0] == b""
+    assert b"".join(out) == b"<html><head><title>t</title>" + SCRIPT + b"</head><body>hi</body></html>"
+
+
+def test_marker_split_one_byte_at_a_time():
+    page = b"<html><head></head><body></body></html>"
+    out = _feed([page[i:i + 1] for i in range(len(page))])
+    assert b"".join(out) == b"<html><head>" + SCRIPT + b"</head><body></body></html>"
+
+
+def test_after_body_without_head():
+    out = _feed([b"<html><bo", b"dy>hi</body></html>"])
+    assert b"".join(out) == b"<html><body>" + SCRIPT + b"hi</body></html>"
+
+
+def test_rest_of_stream_passes_through():
+    injector = HtmlScriptInjector(SCRIPT)
+    injector.feed(b"<head></head>")
+    assert injector.feed(b"</head>") == b"</head>"
+    assert injector.finish() == b""
+
+
+def test_prepends_when_no_marker_within_buffer():
+    out = _feed([b"a" * 10, b"b" * 10], max_buffer=15)
+    assert out[1] == SCRIPT + b"a" * 10 + b"b" * 10
+
+
+def test_prepends_at_end_of_short_document():
+    assert b"".join(_feed([b"plain"])) == SCRIPT + b"plain"
+
+
+def test_inject_script_stream():
+    async def chunks():
+        yield b"<head></he"
+        yield b"ad>"
+
+    async def collect():
+        return [chunk async for chunk in inject_script(chunks(), SCRIPT)]
+
+    assert b"".join(asyncio.run(collect())) == b"<head>" + SCRIPT + b"</head>"
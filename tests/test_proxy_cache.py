@@ -0,0 +1,89 @@
+"""Tests for conditional and range handling of cached Control UI assets."""
+
+from proxy_cache import AssetCache, AssetCacheEntry, derive_etag, etag_matches, serve_cached_asset
+
+BODY = bytes(range(100))
+HEADERS = {
+    "content-type": "application/javascript",
+    "etag": '"v1"',
+    "last-modified": "Tue, 01 Oct 2024 00:00:00 GMT",
+    "cache-control": "public, max-age=60",
+}
+
+
+def _entry():
+    return AssetCacheEntry(BODY, dict(HEADERS))
+
+
+def test_full_response():
+    status, headers, body = serve_cached_asset(_entry(), {})
+    assert status == 200
+    assert body == BODY
+    assert headers["content-length"] == "100"
+    assert headers["accept-ranges"] == "bytes"
+
+
+def test_if_none_match_uses_weak_comparison():
+    for if_none_match in ('"v1"', 'W/"v1"', '"v0", "v1"', "*"):
+        status, headers, body = serve_cached_asset(_entry(), {"if-none-match": if_none_match})
+        assert status == 304, if_none_match
+        assert body == b""
+        assert headers == {"etag": '"v1"', "last-modified": HEADERS["last-modified"], "cache-control": HEADERS["cache-control"]}
+    assert serve_cached_asset(_entry(), {"if-none-match": '"v2"'})[0] == 200
+
+
+def test_if_modified_since():
+    assert serve_cached_asset(_entry(), {"if-modified-since": "Wed, 02 Oct 2024 00:00:00 GMT"})[0] == 304
+    assert serve_cached_asset(_entry(), {"if-modified-since": "Mon, 30 Sep 2024 00:00:00 GMT"})[0] == 200
+    assert serve_cached_asset(_entry(), {"if-modified-since": "garbage"})[0] == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    headers = {"if-none-match": '"v2"', "if-modified-since": "Wed, 02 Oct 2024 00:00:00 GMT"}
+    assert serve_cached_asset(_entry(), headers)[0] == 200
+
+
+def test_ranges():
+    status, headers, body = serve_cached_asset(_entry(), {"range": "bytes=10-19"})
+    assert (status, body, headers["content-range"], headers["content-length"]) == (206, BODY[10:20], "bytes 10-19/100", "10")
+
+    status, headers, body = serve_cached_asset(_entry(), {"range": "bytes=90-"})
+    assert (status, body, headers["content-range"]) == (206, BODY[90:], "bytes 90-99/100")
+
+    status, headers, body = serve_cached_asset(_entry(), {"range": "bytes=-5"})
+    assert (status, body, headers["content-range"]) == (206, BODY[95:], "bytes 95-99/100")
+
+    status, headers, body = serve_cached_asset(_entry(), {"range": "bytes=50-500"})
+    assert (status, body) == (206, BODY[50:])
+
+
+def test_unsatisfiable_range():
+    status, headers, body = serve_cached_asset(_entry(), {"range": "bytes=100-"})
+    assert (status, body, headers["content-range"]) == (416, b"", "bytes */100")
+
+
+def test_ranges_served_in_full():
+    # Multiple ranges, other units and malformed specs get the whole body
+    for range_header in ("bytes=0-1,5-6", "items=0-1", "bytes=a-b"):
+        assert serve_cached_asset(_entry(), {"range": range_header})[0] == 200, range_header
+
+
+def test_if_range():
+    assert serve_cached_asset(_entry(), {"range": "bytes=0-9", "if-range": '"v1"'})[0] == 206
+    assert serve_cached_asset(_entry(), {"range": "bytes=0-9", "if-range": '"v0"'})[0] == 200
+
+
+def test_store_skips_no_store_and_private():
+    cache = AssetCache()
+    for cache_control in ("no-store", "private, max-age=60"):
+        cache.store("/a.js", AssetCacheEntry(BODY, {"cache-control": cache_control}))
+        assert cache.get("/a.js") is None
+    cache.store("/a.js", _entry())
+    assert cache.get("/a.js") is not None
+
+
+def test_derived_etag_is_weak():
+    etag = derive_etag('"v1"', "token")
+    assert etag.startswith('W/"')
+    assert etag != derive_etag('"v1"', "other-token")
+    assert etag_matches(etag, etag.removeprefix("W/"))
@@ -0,0 +1,57 @@
+"""Tests for the signed session tokens."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from session_tokens import SignedSessionTokens
+
+SECRET = "test-secret-" + "x" * 32
+
+
+def _issue(tokens, expires_in=timedelta(hours=1)):
+    return tokens.issue("user_1", "a@example.com", "A", None, datetime.now(timezone.utc) + expires_in)
+
+
+def test_sign_and_verify():
+    tokens = SignedSessionTokens(SECRET)
+    token = _issue(tokens)
+    assert SignedSessionTokens.looks_signed(token)
+    claims = tokens.verify(token)
+    assert claims["sub"] == "user_1"
+    assert claims["email"] == "a@example.com"
+    assert tokens.stats()["verified"] == 1
+
+
+def test_rejects_other_secret_and_tampering():
+    token = _issue(SignedSessionTokens(SECRET))
+    assert SignedSessionTokens("other-" + SECRET).verify(token) is None
+    header, payload, signature = token.split(".")
+    assert SignedSessionTokens(SECRET).verify(f"{header}.{payload}x.{signature}") is None
+
+
+def test_rejects_expired():
+    tokens = SignedSessionTokens(SECRET)
+    assert tokens.verify(_issue(tokens, expires_in=timedelta(seconds=-1))) is None
+    assert tokens.stats()["rejected"] == 1
+
+
+def test_revoke():
+    tokens = SignedSessionTokens(SECRET)
+    token = _issue(tokens)
+    jti, exp = tokens.revocation_entry(token)
+    tokens.revoke(jti, exp)
+    assert tokens.verify(token) is None
+    # Other tokens for the same user are unaffected
+    assert tokens.verify(_issue(tokens)) is not None
+
+
+def test_revocation_entry_ignores_expiry():
+    tokens = SignedSessionTokens(SECRET)
+    assert tokens.revocation_entry(_issue(tokens, expires_in=timedelta(seconds=-1))) is not None
+    assert tokens.revocation_entry("not-a-token") is None
+
+
+def test_expired_revocations_are_pruned():
+    tokens = SignedSessionTokens(SECRET)
+    tokens.load_revocations([("old", time.time() - 1), ("current", time.time() + 60)])
+    assert tokens.stats()["revoked"] == 1
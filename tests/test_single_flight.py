@@ -0,0 +1,147 @@
+"""Tests for the in-process single-flight helper and the shared start lock."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from single_flight import MongoLock, SingleFlight
+
+
+class FakeLockCollection:
+    """Just enough of a Motor collection for MongoLock: one document per _id."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        for key, value in query.items():
+            if isinstance(value, dict):
+                if "$lt" in value and not doc[key] < value["$lt"]:
+                    return False
+                if "$gte" in value and not doc[key] >= value["$gte"]:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None or not self._matches(doc, query):
+            if doc is not None and upsert:
+                raise DuplicateKeyError("lock held")
+            if not upsert:
+                return SimpleNamespace(matched_count=0)
+            doc = self.docs[query["_id"]] = {"_id": query["_id"]}
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and self._matches(doc, query):
+            del self.docs[query["_id"]]
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return doc if doc is not None and self._matches(doc, query) else None
+
+
+def test_concurrent_calls_share_one_run():
+    async def main():
+        flights = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flights.do("gateway", work) for _ in range(3)))
+        return flights, runs, results
+
+    flights, runs, results = asyncio.run(main())
+    assert results == ["done"] * 3
+    assert len(runs) == 1
+    assert flights.stats() == {"in_flight": [], "runs": 1, "joined": 2}
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(flights.do("a", work), flights.do("b", work))
+        return flights.runs
+
+    assert asyncio.run(main()) == 2
+
+
+def test_exception_reaches_every_caller():
+    async def main():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("failed")
+
+        return await asyncio.gather(flights.do("k", work), flights.do("k", work), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_caller_does_not_abort_the_run():
+    async def main():
+        flights = SingleFlight()
+        finished = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            finished.set()
+            return "done"
+
+        first = asyncio.create_task(flights.do("k", work))
+        second = asyncio.create_task(flights.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        result = await second
+        return result, finished.is_set(), flights.in_flight("k")
+
+    assert asyncio.run(main()) == ("done", True, False)
+
+
+def test_new_run_after_completion():
+    async def main():
+        flights = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+
+        await flights.do("k", work)
+        await flights.do("k", work)
+        return len(runs)
+
+    assert asyncio.run(main()) == 2
+
+
+def test_lock_kept_past_its_ttl_while_renewed():
+    async def main():
+        collection = FakeLockCollection()
+        lock = MongoLock(collection, "gateway_start_lock", ttl_seconds=0.06)
+        other = MongoLock(collection, "gateway_start_lock", ttl_seconds=0.06)
+        assert await lock.acquire()
+        renewal = asyncio.create_task(lock.keep_renewed())
+        await asyncio.sleep(0.15)
+        taken_while_renewed = await other.acquire()
+        renewal.cancel()
+        await asyncio.sleep(0.1)
+        taken_after_expiry = await other.acquire()
+        return taken_while_renewed, taken_after_expiry, await lock.renew()
+
+    assert asyncio.run(main()) == (False, True, False)
@@ -0,0 +1,75 @@
+"""Tests for the async SupervisorClient API."""
+
+import asyncio
+import threading
+
+import pytest
+
+from supervisor_client import SupervisorClient
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record the blocking supervisor calls and the thread each one ran in."""
+    calls = []
+
+    def blocking(action):
+        def call(program=None):
+            calls.append((action, program, threading.get_ident()))
+            return True
+        return call
+
+    for action in ("start", "stop", "restart"):
+        monkeypatch.setattr(SupervisorClient, f"_{action}", blocking(action))
+    monkeypatch.setattr(SupervisorClient, "info", lambda program=None: {"state": "RUNNING", "pid": 42})
+    monkeypatch.setattr(SupervisorClient, "_listeners", [])
+    return calls
+
+
+def test_actions_run_off_the_event_loop(calls):
+    async def main():
+        loop_thread = threading.get_ident()
+        await SupervisorClient.astart()
+        await SupervisorClient.astop()
+        await SupervisorClient.arestart()
+        return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert [action for action, _, _ in calls] == ["start", "stop", "restart"]
+    assert all(thread != loop_thread for _, _, thread in calls)
+
+
+def test_listeners_run_on_the_loop(calls):
+    notified = []
+
+    async def main():
+        SupervisorClient.add_listener(lambda action: notified.append((action, threading.get_ident())))
+        await SupervisorClient.astart()
+        await SupervisorClient.astop()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert notified == [("start", loop_thread), ("stop", loop_thread)]
+
+
+def test_other_programs_do_not_notify(calls):
+    notified = []
+    SupervisorClient.add_listener(notified.append)
+    assert asyncio.run(SupervisorClient.astart("clawdbot-gateway-18800"))
+    assert calls[0][1] == "clawdbot-gateway-18800"
+    assert notified == []
+
+
+def test_failed_action_does_not_notify(calls, monkeypatch):
+    notified = []
+    SupervisorClient.add_listener(notified.append)
+    monkeypatch.setattr(SupervisorClient, "_stop", lambda program=None: False)
+    assert asyncio.run(SupervisorClient.astop()) is False
+    assert notified == []
+
+
+def test_status_and_pid(calls):
+    async def main():
+        return await SupervisorClient.astatus(), await SupervisorClient.aget_pid(), await SupervisorClient.ainfo()
+
+    assert asyncio.run(main()) == (True, 42, {"state": "RUNNING", "pid": 42})